@@ -17,6 +17,7 @@
 #include "G4VisAttributes.hh"
 #include "G4Color.hh"
 #include "G4SDManager.hh"
+#include "G4GenericMessenger.hh"
 
 #include "PMSensitiveDetector.hh"
 
@@ -31,6 +32,11 @@ public :
 private :
     G4LogicalVolume * logicDetector;
 
+    G4GenericMessenger *fMessenger;
+    G4String fRecordMode;
+    G4int fVerboseLevel;
+    G4double fLeadThickness;
+
     virtual void ConstructSDandField();
 };
 
@@ -6,6 +6,7 @@
 #include "G4AnalysisManager.hh"
 #include "G4SystemOfUnits.hh"
 #include "G4UnitsTable.hh"
+#include "G4GenericMessenger.hh"
 
 class PMRunAction : public G4UserRunAction
 {
@@ -15,6 +16,11 @@ public:
 
     virtual void BeginOfRunAction(const G4Run *);
     virtual void EndOfRunAction(const G4Run *);
+
+private:
+    G4GenericMessenger *fMessenger;
+    G4String fFileName;
+    G4String fFileType;
 };
 
 #endif
\ No newline at end of file
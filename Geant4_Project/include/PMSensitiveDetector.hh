@@ -1,6 +1,8 @@
 #ifndef PMSENSITIVEDETECTOR_HH
 #define PMSENSITIVEDETECTOR_HH
 
+#include <vector>
+
 #include "G4VSensitiveDetector.hh"
 
 #include "G4RunManager.hh"
@@ -11,11 +13,27 @@
 class PMSensitiveDetector : public G4VSensitiveDetector
 {
 public :
-    PMSensitiveDetector(G4String);
+    PMSensitiveDetector(G4String, G4String recordMode = "full", G4int verboseLevel = 0);
     ~PMSensitiveDetector();
 
 private :
+    enum RecordMode { kFull, kEdepOnly, kSummary };
+
+    struct Hit
+    {
+        G4double x, y, z;
+        G4double globalTime;
+        G4double wlen;
+    };
+
     G4double fTotalEnergyDeposited;
+    G4int fStepCount;
+
+    RecordMode fRecordMode;
+    G4int fVerboseLevel;
+
+    // Each worker thread has its own detector, so this buffer is per thread
+    std::vector<Hit> fHits;
 
     virtual void Initialize(G4HCofThisEvent *) override;
     virtual void EndOfEvent(G4HCofThisEvent *) override;
@@ -2,10 +2,30 @@
 
 PMDetectorConstruction::PMDetectorConstruction()
 {
+    fRecordMode = "full";
+    fVerboseLevel = 0;
+    fLeadThickness = 2. *mm;
+
+    // Only the master owns this messenger; worker threads pick the values up when they build their detectors
+    fMessenger = new G4GenericMessenger(this, "/PM/detector/", "Detector settings");
+
+    G4GenericMessenger::Command &recordModeCmd = fMessenger->DeclareProperty("recordMode", fRecordMode,
+        "What the detector records: full (a row per step), edep (rows only for steps that deposit energy) or summary (per-event totals only). Set before /run/initialize.");
+    recordModeCmd.SetCandidates("full edep summary");
+    recordModeCmd.SetToBeBroadcasted(false);
+
+    G4GenericMessenger::Command &verboseCmd = fMessenger->DeclareProperty("verbose", fVerboseLevel,
+        "1 prints the deposited energy of every event. Set before /run/initialize.");
+    verboseCmd.SetToBeBroadcasted(false);
+
+    G4GenericMessenger::Command &thicknessCmd = fMessenger->DeclarePropertyWithUnit("leadThickness", "mm", fLeadThickness,
+        "Thickness of the lead sheet (up to 10 mm, where it would touch the detector). Set before /run/initialize.");
+    thicknessCmd.SetToBeBroadcasted(false);
 }
 
 PMDetectorConstruction::~PMDetectorConstruction()
 {
+    delete fMessenger;
 }
 
 G4VPhysicalVolume *PMDetectorConstruction::Construct()
@@ -25,9 +45,8 @@ G4VPhysicalVolume *PMDetectorConstruction::Construct()
     G4LogicalVolume *logicWorld = new G4LogicalVolume(solidWorld, worldMat, "logicalWorld");
     G4VPhysicalVolume *physWorld = new G4PVPlacement(0, G4ThreeVector(0.,0.,0.), logicWorld, "physWorld", 0, false, 0, checkOverlaps);
 
-    G4double leadThickness = 2. *mm;
     G4double leadSize = 10. *cm;
-    G4Box *solidLead = new G4Box("solidLead", 0.5 *leadSize, 0.5 *leadSize, 0.5 *leadThickness);
+    G4Box *solidLead = new G4Box("solidLead", 0.5 *leadSize, 0.5 *leadSize, 0.5 *fLeadThickness);
     G4LogicalVolume *logicLead = new G4LogicalVolume(solidLead, leadMat, "logicLead");
     G4VPhysicalVolume *physLead = new G4PVPlacement(0, G4ThreeVector(0., 0., 5. *cm), logicLead, "physLead", logicWorld, false, checkOverlaps);
 
@@ -50,7 +69,7 @@ G4VPhysicalVolume *PMDetectorConstruction::Construct()
 
 void PMDetectorConstruction::ConstructSDandField()
 {
-    PMSensitiveDetector *sensDet = new PMSensitiveDetector("SensitiveDetector");
+    PMSensitiveDetector *sensDet = new PMSensitiveDetector("SensitiveDetector", fRecordMode, fVerboseLevel);
     logicDetector->SetSensitiveDetector(sensDet);
     G4SDManager::GetSDMpointer()->AddNewDetector(sensDet);
 
@@ -3,6 +3,16 @@
 PMRunAction::PMRunAction()
 
 {
+    fFileName = "output";
+    fFileType = "root";
+
+    fMessenger = new G4GenericMessenger(this, "/PM/run/", "Run settings");
+    fMessenger->DeclareProperty("fileName", fFileName,
+        "Base name of the output file; the run number and file type are appended (default: output)");
+    fMessenger->DeclareProperty("fileType", fFileType,
+        "Output format: root (default) or csv, which needs no ROOT to read back")
+        .SetCandidates("root csv");
+
     G4AnalysisManager *analysisManager = G4AnalysisManager::Instance();
 
     analysisManager->CreateH1("Edep", "Energy deposit", 100, 0., 1.1 * MeV);
@@ -15,11 +25,17 @@ PMRunAction::PMRunAction()
     analysisManager->CreateNtupleDColumn("fGlobalTime");
     analysisManager->CreateNtupleDColumn("fWlen");
     analysisManager->FinishNtuple(0);
+
+    analysisManager->CreateNtuple("Events", "Events");
+    analysisManager->CreateNtupleIColumn("iEvent");
+    analysisManager->CreateNtupleDColumn("fEdep");
+    analysisManager->CreateNtupleIColumn("nSteps");
+    analysisManager->FinishNtuple(1);
 }
 
 PMRunAction::~PMRunAction()
 {
-
+    delete fMessenger;
 }
 
 void PMRunAction::BeginOfRunAction(const G4Run *run)
@@ -31,7 +47,7 @@ void PMRunAction::BeginOfRunAction(const G4Run *run)
     std::stringstream strRunID;
     strRunID << runID;
 
-    analysisManager->OpenFile("output"+ strRunID.str()+ ".root");
+    analysisManager->OpenFile(fFileName + strRunID.str() + "." + fFileType);
 
 }
 
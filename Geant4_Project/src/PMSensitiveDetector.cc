@@ -1,8 +1,25 @@
 #include "PMSensitiveDetector.hh"
 
-PMSensitiveDetector::PMSensitiveDetector(G4String name) : G4VSensitiveDetector(name)
+PMSensitiveDetector::PMSensitiveDetector(G4String name, G4String recordMode, G4int verboseLevel) : G4VSensitiveDetector(name)
 {
     fTotalEnergyDeposited = 0.;
+    fStepCount = 0;
+    fVerboseLevel = verboseLevel;
+
+    if (recordMode == "edep")
+    {
+        fRecordMode = kEdepOnly;
+    }
+    else if (recordMode == "summary")
+    {
+        fRecordMode = kSummary;
+    }
+    else
+    {
+        fRecordMode = kFull;
+    }
+
+    fHits.reserve(1024);
 }
 
 PMSensitiveDetector::~PMSensitiveDetector()
@@ -12,13 +29,25 @@ PMSensitiveDetector::~PMSensitiveDetector()
 void PMSensitiveDetector::Initialize(G4HCofThisEvent *)
 {
     fTotalEnergyDeposited = 0.;
+    fStepCount = 0;
+    fHits.clear();
 }
 
 G4bool PMSensitiveDetector::ProcessHits(G4Step *aStep, G4TouchableHistory *ROhist)
 {
-    G4int eventID = G4RunManager::GetRunManager()->GetCurrentEvent()->GetEventID();
+    G4double energyDeposited = aStep->GetTotalEnergyDeposit();
 
-    G4AnalysisManager *analysisManager = G4AnalysisManager::Instance();
+    fStepCount++;
+
+    if (energyDeposited > 0)
+    {
+        fTotalEnergyDeposited += energyDeposited;
+    }
+
+    if (fRecordMode == kSummary || (fRecordMode == kEdepOnly && energyDeposited <= 0))
+    {
+        return true;
+    }
 
     G4StepPoint *preStepPoint = aStep->GetPreStepPoint();
 
@@ -30,29 +59,39 @@ G4bool PMSensitiveDetector::ProcessHits(G4Step *aStep, G4TouchableHistory *ROhis
 
     G4double fWlen = (1.239841939 * eV / fMomPhotonMag) * 1E+03;
 
-    analysisManager->FillNtupleIColumn(0, 0, eventID);
-    analysisManager->FillNtupleDColumn(0, 1, posPhoton[0]);
-    analysisManager->FillNtupleDColumn(0, 2, posPhoton[1]);
-    analysisManager->FillNtupleDColumn(0, 3, posPhoton[2]);
-    analysisManager->FillNtupleDColumn(0, 4, fGlobalTime);
-    analysisManager->FillNtupleDColumn(0, 5, fWlen);
-    analysisManager->AddNtupleRow(0);
-
-    G4double energyDeposited = aStep->GetTotalEnergyDeposit();
-
-    if (energyDeposited > 0)
-    {
-        fTotalEnergyDeposited += energyDeposited;
-    }
+    fHits.push_back({posPhoton[0], posPhoton[1], posPhoton[2], fGlobalTime, fWlen});
 
     return true;
 }
 
 void PMSensitiveDetector::EndOfEvent(G4HCofThisEvent *)
 {
+    G4int eventID = G4RunManager::GetRunManager()->GetCurrentEvent()->GetEventID();
+
     G4AnalysisManager *analysisManager = G4AnalysisManager::Instance();
 
+    // The rows of the whole event are written in one go instead of from every step
+    for (const Hit &hit : fHits)
+    {
+        analysisManager->FillNtupleIColumn(0, 0, eventID);
+        analysisManager->FillNtupleDColumn(0, 1, hit.x);
+        analysisManager->FillNtupleDColumn(0, 2, hit.y);
+        analysisManager->FillNtupleDColumn(0, 3, hit.z);
+        analysisManager->FillNtupleDColumn(0, 4, hit.globalTime);
+        analysisManager->FillNtupleDColumn(0, 5, hit.wlen);
+        analysisManager->AddNtupleRow(0);
+    }
+    fHits.clear();
+
     analysisManager->FillH1(0, fTotalEnergyDeposited);
 
-    G4cout << "Deposited energy: " << fTotalEnergyDeposited << G4endl;
-}
+    analysisManager->FillNtupleIColumn(1, 0, eventID);
+    analysisManager->FillNtupleDColumn(1, 1, fTotalEnergyDeposited);
+    analysisManager->FillNtupleIColumn(1, 2, fStepCount);
+    analysisManager->AddNtupleRow(1);
+
+    if (fVerboseLevel > 0)
+    {
+        G4cout << "Deposited energy: " << fTotalEnergyDeposited << G4endl;
+    }
+}
\ No newline at end of file
@@ -10,12 +10,38 @@ import shutil
 import subprocess
 import platform
 import re
-import requests
-from urllib.parse import urljoin
+import json
+import time
+import hashlib
+import tarfile
+import threading
+import signal
+import io
+import gzip
+import collections
+import atexit
+import contextlib
+import tempfile
+import importlib
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 import argparse
-from colorama import Fore, Style, init
 
 args = None
+log_dir = None
+
+class LazyModule:
+    # Imports the module on first attribute access, so `requests` is only loaded once we hit the network.
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+requests = LazyModule("requests")
 
 def check_and_fix_permissions(path):
     if not os.access(path, os.W_OK):
@@ -43,44 +69,93 @@ def ensure_xdg_open_installed():
             sys.exit(1)
 
 def ensure_basic_utilities():
-    try:
-        from colorama import Fore, Style, init
-    except ImportError:
-        print("[INFO] colorama not found. Attempting to install required packages...")
+    if importlib.util.find_spec("requests") is None:
+        print("[INFO] requests not found. Attempting to install required packages...")
         package_managers = {
-            "apt": "sudo apt update && sudo apt install -y python3-colorama lsb-release",
-            "dnf": "sudo dnf install -y python3-colorama redhat-lsb-core",
-            "yum": "sudo yum install -y python3-colorama redhat-lsb-core",
-            "pacman": "sudo pacman -Sy --noconfirm python-colorama lsb-release",
-            "zypper": "sudo zypper install -y python3-colorama lsb-release"
+            "apt": "sudo apt update && sudo apt install -y python3-requests",
+            "dnf": "sudo dnf install -y python3-requests",
+            "yum": "sudo yum install -y python3-requests",
+            "pacman": "sudo pacman -Sy --noconfirm python-requests",
+            "zypper": "sudo zypper install -y python3-requests"
         }
         for manager, command in package_managers.items():
-            if subprocess.call(f"command -v {manager}", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) == 0:
+            if shutil.which(manager):
                 try:
                     subprocess.check_call(command, shell=True)
                     os.execv(sys.executable, [sys.executable] + sys.argv)
                 except subprocess.CalledProcessError:
                     continue
-        print("\033[95m[ACTION REQUIRED]\033[0m Install colorama and lsb-release manually:")
-        print("    sudo apt install python3-colorama lsb-release")
-        print("    sudo dnf install python3-colorama redhat-lsb-core")
-        print("    sudo yum install python3-colorama redhat-lsb-core")
-        print("    sudo pacman -Sy python-colorama lsb-release")
+        print("\033[95m[ACTION REQUIRED]\033[0m Install requests manually:")
+        print("    sudo apt install python3-requests")
+        print("    sudo dnf install python3-requests")
+        print("    sudo yum install python3-requests")
+        print("    sudo pacman -Sy python-requests")
         sys.exit(1)
-    init(autoreset=True)
 
-ensure_basic_utilities()
+COLORS = {"CYAN": "\033[36m", "GREEN": "\033[32m", "YELLOW": "\033[33m", "RED": "\033[31m", "MAGENTA": "\033[35m"}
 
 def print_message(tag, color, message):
-    print(f"{color}[{tag}]{Style.RESET_ALL} {message}")
+    # Plain ANSI codes: the same sequences colorama emits on Linux, without importing it before the first line.
+    print(f"{COLORS[color]}[{tag}]\033[0m {message}")
+
+print_info = lambda msg: print_message("INFO", "CYAN", msg)
+print_success = lambda msg: print_message("SUCCESS", "GREEN", msg)
+print_warning = lambda msg: print_message("WARNING", "YELLOW", msg)
+print_error = lambda msg: print_message("ERROR", "RED", msg)
+print_action = lambda msg: print_message("ACTION REQUIRED", "MAGENTA", msg)
 
-print_info = lambda msg: print_message("INFO", Fore.CYAN, msg)
-print_success = lambda msg: print_message("SUCCESS", Fore.GREEN, msg)
-print_warning = lambda msg: print_message("WARNING", Fore.YELLOW, msg)
-print_error = lambda msg: print_message("ERROR", Fore.RED, msg)
-print_action = lambda msg: print_message("ACTION REQUIRED", Fore.MAGENTA, msg)
+NINJA_PROGRESS = re.compile(rb"\[(\d+)/(\d+)\]")
+MAKE_PROGRESS = re.compile(rb"\[\s*(\d+)%\]")
+TAIL_LINES = 100
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+def progress_reporter(interval=0.5):
+    # Turns Ninja "[done/total]" or Make "[ 42%]" lines into a single, rate-limited status line.
+    state = {"started": time.monotonic(), "last": 0.0, "done": 0, "total": 0, "percent": None, "units": 0, "shown": False}
+
+    def update(block, final=False):
+        ninja = NINJA_PROGRESS.findall(block)
+        if ninja:
+            state["done"], state["total"] = int(ninja[-1][0]), int(ninja[-1][1])
+        else:
+            make = MAKE_PROGRESS.findall(block)
+            if make:
+                state["percent"] = int(make[-1])
+            state["units"] += block.count(b"Building C")
+        now = time.monotonic()
+        if not final and now - state["last"] < interval:
+            return
+        state["last"] = now
+        elapsed = max(now - state["started"], 1e-3)
+        if state["total"]:
+            rate = state["done"] / elapsed
+            eta = (state["total"] - state["done"]) / rate if rate > 0 else 0
+            line = f"[{state['done']}/{state['total']}] {rate:.0f} TU/s, ETA {format_duration(eta)}"
+        elif state["percent"] is not None:
+            rate = state["units"] / elapsed
+            eta = elapsed * (100 - state["percent"]) / state["percent"] if state["percent"] else 0
+            line = f"[{state['percent']:3d}%] {rate:.0f} TU/s, ETA {format_duration(eta)}"
+        else:
+            return
+        state["shown"] = True
+        print(f"\r  {line}\033[K", end="\n" if final else "", flush=True)
 
-def run_command(command, description="", interactive=False, silent=False):
+    return update
+
+def open_command_log(log_name):
+    path = os.path.join(log_dir or os.getcwd(), f"{log_name}.log.gz")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Appending keeps earlier attempts (e.g. a build restarted with fewer jobs) as extra gzip members.
+    return path, io.BufferedWriter(gzip.open(path, "ab", compresslevel=3), buffer_size=1024 * 1024)
+
+def run_command(command, description="", interactive=False, silent=False, monitor=None, log_name=None):
     if not silent:
         print_info(f"Running command: {command} ({description})")
     try:
@@ -92,51 +167,146 @@ def run_command(command, description="", interactive=False, silent=False):
                 shell=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                encoding="utf-8",
-                errors="replace"
+                start_new_session=monitor is not None
             )
-            for line in process.stdout:
-                if not silent:
-                    print(line, end='')
+            if monitor:
+                threading.Thread(target=monitor, args=(process,), daemon=True).start()
+            log_path, log = open_command_log(log_name) if log_name else (None, None)
+            progress = progress_reporter() if log_name and not silent else None
+            if log_path and not silent:
+                print_info(f"Full output is logged to {log_path}")
+            tail = collections.deque(maxlen=TAIL_LINES)
+            partial = b""
+            try:
+                fd = process.stdout.fileno()
+                while True:
+                    block = os.read(fd, 1024 * 1024)
+                    if not block:
+                        break
+                    if log:
+                        log.write(block)
+                    lines = (partial + block).split(b"\n")
+                    partial = lines.pop()
+                    tail.extend(lines)
+                    if progress:
+                        progress(block)
+                    elif not silent:
+                        sys.stdout.buffer.write(block)
+                        sys.stdout.flush()
+            except KeyboardInterrupt:
+                if monitor:
+                    try:
+                        os.killpg(process.pid, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+                raise
+            finally:
+                if log:
+                    log.close()
+            if partial:
+                tail.append(partial)
             process.wait()
+            if progress:
+                progress(b"", final=True)
             if process.returncode != 0:
-                raise subprocess.CalledProcessError(process.returncode, command, output="".join(process.stdout.readlines()))
+                output = b"\n".join(tail).decode("utf-8", errors="replace")
+                if log_path:
+                    output += f"\n(full log: {log_path})"
+                raise subprocess.CalledProcessError(process.returncode, command, output=output)
         if not silent:
             print_success(f"{description} completed!")
         return 0
     except subprocess.CalledProcessError as e:
         if not silent:
             print_error(f"{description} failed: {e}")
-        print_error(f"Command output: {e.output}")
+        print_error(f"Command output (last {TAIL_LINES} lines):\n{e.output}" if e.output else "Command produced no output.")
         return e.returncode
 
 def is_wsl():
     return "microsoft" in platform.uname().release.lower()
 
-def detect_os():
+HOST_TOOLS = ["cmake", "ninja", "ninja-build", "ccache", "g++", "gcc", "make", "qmake", "qmake-qt5", "sudo", "xdg-open"]
+
+def read_os_release(path="/etc/os-release"):
+    release = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, value = line.strip().partition("=")
+                if key:
+                    release[key] = value.strip().strip('"')
+    except OSError:
+        pass
+    return release
+
+def probe_tool_version(path):
+    try:
+        result = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=10)
+        return result.stdout.strip().splitlines()[0] if result.stdout.strip() else None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def probe_libgl():
+    # Scan the loader cache directly instead of spawning `ldconfig -p | grep libGL`.
+    try:
+        with open("/etc/ld.so.cache", "rb") as f:
+            return b"libGL.so" in f.read()
+    except OSError:
+        result = subprocess.run("ldconfig -p", shell=True, capture_output=True, text=True)
+        return "libGL.so" in result.stdout
+
+def host_facts_key(tools):
+    inputs = [platform.uname().release, os.environ.get("PATH", "")]
+    for path in ["/etc/os-release", "/etc/ld.so.cache"] + [p for p in tools.values() if p]:
+        try:
+            st = os.stat(path)
+            inputs.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            inputs.append(f"{path}:missing")
+    return hashlib.sha256("\n".join(inputs).encode()).hexdigest()
+
+def get_host_facts():
+    tools = {tool: shutil.which(tool) for tool in HOST_TOOLS}
+    key = host_facts_key(tools)
+    cache_path = os.path.join(get_cache_dir(), "host_facts.json")
+    try:
+        with open(cache_path, "r") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["facts"]
+    except (OSError, ValueError):
+        pass
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        versions = {tool: pool.submit(probe_tool_version, path)
+                    for tool, path in tools.items() if path and tool in ("cmake", "g++", "gcc", "ninja", "ccache")}
+        libgl = pool.submit(probe_libgl)
+        facts = {
+            "os_release": read_os_release(),
+            "wsl": "microsoft" in platform.uname().release.lower(),
+            "tools": tools,
+            "versions": {tool: future.result() for tool, future in versions.items()},
+            "libgl": libgl.result(),
+        }
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump({"key": key, "facts": facts}, f, indent=1)
+    except OSError:
+        pass
+    return facts
+
+def detect_os(facts):
     os_type = platform.system()
     if os_type == "Linux":
-        print_info("Detecting Linux distribution...")
-        try:
-            if shutil.which("fastfetch"):
-                result = subprocess.run(["fastfetch"], capture_output=True, text=True, check=True)
-                distro_info = result.stdout.strip()
-            elif shutil.which("neofetch"):
-                result = subprocess.run(["neofetch", "--off"], capture_output=True, text=True, check=True)
-                distro_info = result.stdout.strip()
-            else:
-                result = subprocess.run(["lsb_release", "-a"], capture_output=True, text=True)
-                if result.returncode == 0:
-                    distro_info = result.stdout.strip()
-                else:
-                    with open("/etc/os-release", "r") as f:
-                        distro_info = f.read().strip()
-            print_info(f"Detected OS info:\n{distro_info}")
-            return os_type, distro_info
-        except Exception as e:
-            print_warning(f"Failed to detect Linux distribution details: {e}")
+        release = facts["os_release"]
+        if not release:
+            print_warning("Failed to detect Linux distribution details: /etc/os-release is missing.")
             return os_type, "unknown"
+        # Keep "<id> <version>" in the string so checks like "fedora 41" in get_install_command() still match.
+        distro_info = "\n".join([release.get("PRETTY_NAME", ""), f"{release.get('ID', '')} {release.get('VERSION_ID', '')}",
+                                 release.get("ID_LIKE", "")]).strip()
+        print_info(f"Detected OS: {release.get('PRETTY_NAME', release.get('NAME', 'Linux'))}" + (" (WSL)" if facts["wsl"] else ""))
+        return os_type, distro_info
     elif os_type == "Windows":
         print_info(f"Detected OS info: Windows OS: {platform.platform()}")
         return os_type, "windows"
@@ -144,23 +314,124 @@ def detect_os():
         print_info(f"Unsupported OS: {os_type}")
         return os_type, "unsupported"
 
+COMPILE_JOB_MEMORY = 1536 * 1024 * 1024
+LINK_JOB_MEMORY = 4096 * 1024 * 1024
+
+def read_first_line(path):
+    try:
+        with open(path, "r") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+def get_usable_cpus():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota, period = None, None
+    cpu_max = read_first_line("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        value, _, period_value = cpu_max.partition(" ")
+        if value != "max":
+            quota, period = int(value), int(period_value or 100000)
+    else:
+        quota_value = read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period_value = read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if quota_value and period_value and int(quota_value) > 0:
+            quota, period = int(quota_value), int(period_value)
+    if quota and period:
+        cpus = min(cpus, max(1, -(-quota // period)))
+    return max(1, cpus)
+
+def get_memory_info():
+    meminfo = {}
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                meminfo[key] = int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None, None
+    total = meminfo.get("MemTotal")
+    available = meminfo.get("MemAvailable", meminfo.get("MemFree"))
+    # A container or WSL cgroup limit can be far below what /proc/meminfo reports.
+    for limit_path, usage_path in (("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+                                   ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes")):
+        limit, usage = read_first_line(limit_path), read_first_line(usage_path)
+        if limit and limit.isdigit() and usage and usage.isdigit() and int(limit) < (total or int(limit) + 1):
+            total = int(limit)
+            available = min(available or total, max(0, int(limit) - int(usage)))
+            break
+    return total, available
+
+def get_memory_pressure():
+    line = read_first_line("/proc/pressure/memory")
+    match = re.search(r"avg10=([\d.]+)", line or "")
+    return float(match.group(1)) if match else 0.0
+
 def get_cpu_cores():
-    print_info("(If you don't know your CPU core count, open a new terminal and run: `nproc`, then enter the number here.)")
+    if args is not None and args.jobs:
+        return args.jobs
+    cpus = get_usable_cpus()
+    total, available = get_memory_info()
+    if available is None:
+        print_info(f"Using {cpus} parallel jobs ({cpus} usable CPUs).")
+        return cpus
+    cores = max(1, min(cpus, available // COMPILE_JOB_MEMORY))
+    print_info(f"Using {cores} parallel jobs ({cpus} usable CPUs, {available / 1073741824:.1f} GiB memory available).")
+    if cores < cpus:
+        print_warning("Limiting parallel jobs to fit in memory. Pass --jobs to override.")
+    return cores
+
+def get_link_jobs(cores):
+    _, available = get_memory_info()
+    if available is None:
+        return max(1, cores // 2)
+    return max(1, min(cores, available // LINK_JOB_MEMORY))
+
+def memory_watchdog(state, interval=2):
+    total, _ = get_memory_info()
+    low_memory = max(512 * 1024 * 1024, (total or 0) // 20)
+
+    def watch(process):
+        strikes = 0
+        while process.poll() is None:
+            time.sleep(interval)
+            _, available = get_memory_info()
+            if (available is not None and available < low_memory) or get_memory_pressure() > 40:
+                strikes += 1
+            else:
+                strikes = 0
+            if strikes >= 2 and process.poll() is None:
+                state["oom_risk"] = True
+                try:
+                    os.killpg(process.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    # The build exited between poll() and killpg().
+                    pass
+                return
+
+    return watch
+
+def run_build(command, cores, description, log_name=None, on_retry=None):
+    # Both Ninja and Make pick up where they stopped, so restarting with fewer jobs only costs the TUs in flight.
     while True:
-        try:
-            cores = int(input("Enter the number of CPU cores for compilation: ").strip())
-            if cores > 0:
-                return cores
-        except ValueError:
-            pass
-        print_warning("Invalid input. Try again.")
+        state = {"oom_risk": False}
+        monitor = memory_watchdog(state) if cores > 1 else None
+        status = run_command(command.format(jobs=cores), description, monitor=monitor, log_name=log_name)
+        if status == 0 or not state["oom_risk"] or cores == 1:
+            return status
+        cores = max(1, cores // 2)
+        print_warning(f"Memory is running out. Restarting the build with {cores} parallel jobs.")
+        if on_retry:
+            on_retry(cores)
 
-def check_dependencies():
+def check_dependencies(facts):
     missing = []
-    # Check for qmake and libGL in one go
-    if run_command("which qmake", silent=True) != 0:
+    if not (facts["tools"]["qmake"] or facts["tools"]["qmake-qt5"]):
         missing.append("Qt5 (qmake)")
-    if run_command("ldconfig -p | grep libGL", silent=True) != 0:
+    if not facts["libgl"]:
         missing.append("OpenGL (libGL)")
     if missing:
         print_error(f"Missing dependencies: {', '.join(missing)}")
@@ -173,105 +444,803 @@ def check_dependencies():
     else:
         print_success("All required dependencies are present.")
 
-def prompt(message):
+phase_records = []
+
+def read_used_memory():
+    total, available = get_memory_info()
+    return total - available if total and available is not None else None
+
+def read_process_tree_rss(root_pid):
+    # Sum the resident memory of a process and all of its descendants, straight from /proc.
+    children, rss = {}, {}
+    try:
+        pids = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return None
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", "r") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(pid))
+        rss[int(pid)] = int(fields[21])
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total * os.sysconf("SC_PAGE_SIZE")
+
+@contextlib.contextmanager
+def timed_phase(name):
+    started_at = time.time()
+    started = time.perf_counter()
+    cpu_before = os.times()
+    baseline = read_used_memory() or 0
+    peak = [baseline]
+    # ru_maxrss is a lifetime maximum, so the phase's own peak comes from sampling the process tree.
+    peak_rss = [read_process_tree_rss(os.getpid()) or 0]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(0.5):
+            used = read_used_memory()
+            if used and used > peak[0]:
+                peak[0] = used
+            tree_rss = read_process_tree_rss(os.getpid())
+            if tree_rss and tree_rss > peak_rss[0]:
+                peak_rss[0] = tree_rss
+
+    threading.Thread(target=sample, daemon=True).start()
+    try:
+        yield
+    finally:
+        stop.set()
+        cpu_after = os.times()
+        cpu = sum(getattr(cpu_after, field) - getattr(cpu_before, field)
+                  for field in ("user", "system", "children_user", "children_system"))
+        phase_records.append({
+            "name": name,
+            "start": started_at,
+            "wall_s": round(time.perf_counter() - started, 3),
+            "cpu_s": round(cpu, 3),
+            "peak_tree_rss_mb": round(peak_rss[0] / 1048576, 1),
+            "peak_memory_growth_mb": round((peak[0] - baseline) / 1048576, 1),
+        })
+
+def read_ninja_log(build_dir):
+    entries = []
+    last_end = 0
+    try:
+        with open(os.path.join(build_dir, ".ninja_log"), "r") as f:
+            for line in f:
+                if line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 4:
+                    continue
+                start, end = int(fields[0]), int(fields[1])
+                # Entries are appended as jobs finish, so a smaller end time means a newer ninja run began.
+                if end < last_end:
+                    entries = []
+                last_end = end
+                entries.append((start, end, fields[3]))
+    except (OSError, ValueError):
+        return []
+    return entries
+
+def write_profile_report(report_dir, build_dir):
+    if not phase_records:
+        return
+    origin = phase_records[0]["start"]
+    events = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "installer phases"}},
+              {"name": "process_name", "ph": "M", "pid": 2, "args": {"name": "build targets"}}]
+    for record in phase_records:
+        events.append({"name": record["name"], "cat": "phase", "ph": "X", "pid": 1, "tid": 1,
+                       "ts": int((record["start"] - origin) * 1e6), "dur": int(record["wall_s"] * 1e6),
+                       "args": {key: value for key, value in record.items() if key not in ("name", "start")}})
+    targets = read_ninja_log(build_dir)
+    compile_phase = next((record for record in phase_records if record["name"] == "compile"), None)
+    offset = (compile_phase["start"] - origin) * 1e6 if compile_phase else 0
+    lanes = []
+    for start, end, output in sorted(targets):
+        lane = next((i for i, lane_end in enumerate(lanes) if lane_end <= start), len(lanes))
+        if lane == len(lanes):
+            lanes.append(end)
+        else:
+            lanes[lane] = end
+        events.append({"name": os.path.basename(output), "cat": "target", "ph": "X", "pid": 2, "tid": lane + 1,
+                       "ts": int(offset + start * 1000), "dur": (end - start) * 1000, "args": {"output": output}})
+    os.makedirs(report_dir, exist_ok=True)
+    trace_path = os.path.join(report_dir, "install-trace.json")
+    with open(trace_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    lines = ["Phase                  wall      cpu  peak RSS  mem growth"]
+    for record in phase_records:
+        lines.append(f"{record['name']:<20} {format_duration(record['wall_s']):>6} {format_duration(record['cpu_s']):>8} "
+                     f"{record['peak_tree_rss_mb']:>8.0f}M {record['peak_memory_growth_mb']:>9.0f}M")
+    if targets:
+        lines += ["", "Top 20 slowest targets:"]
+        for start, end, output in sorted(targets, key=lambda t: t[0] - t[1])[:20]:
+            lines.append(f"  {(end - start) / 1000:8.1f}s  {output}")
+    elif compile_phase:
+        lines += ["", "No .ninja_log found; per-target timings are only available with the Ninja generator."]
+    summary_path = os.path.join(report_dir, "install-profile.txt")
+    with open(summary_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print_info("Install profile:\n" + "\n".join(lines))
+    print_info(f"Timing trace for chrome://tracing or Perfetto: {trace_path}")
+
+def prompt(message, default='y'):
     global args
     if args.non_interactive or args.yes_to_all:
-        return 'y'
+        return default
     return input(message)
 
-def get_latest_geant4_version():
-    headers = {"User-Agent": "Mozilla/5.0"}
+def file_digest(path, algorithm="sha256", block_size=4 * 1024 * 1024):
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def probe_download(url, timeout=30):
+    # Ask for a single byte: a 206 tells us both the full size and that Range requests work.
+    with requests.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout, allow_redirects=True) as response:
+        response.raise_for_status()
+        if response.status_code == 206:
+            match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+            if match:
+                return int(match.group(1)), True
+        length = response.headers.get("Content-Length")
+        return (int(length) if length and response.status_code == 200 else None), False
+
+def load_download_journal(journal_path, url, size, chunk_size):
     try:
-        response = requests.get("https://gitlab.cern.ch/geant4/geant4/-/tags", headers=headers)
+        with open(journal_path, "r") as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if journal.get("url") != url or journal.get("size") != size or journal.get("chunk_size") != chunk_size:
+        return None
+    return journal
+
+def save_download_journal(journal_path, journal):
+    tmp_path = journal_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(journal, f)
+    os.replace(tmp_path, journal_path)
+
+def fetch_chunk(url, fd, chunk, state, timeout=60, retries=5):
+    start, end = chunk["start"], chunk["end"]
+    for attempt in range(retries + 1):
+        offset = start + chunk["done"]
+        if offset > end:
+            return
+        try:
+            headers = {"Range": f"bytes={offset}-{end}"}
+            with requests.get(url, headers=headers, stream=True, timeout=(15, timeout)) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise IOError(f"server ignored Range request (HTTP {response.status_code})")
+                for block in response.iter_content(64 * 1024):
+                    if state["stop"].is_set():
+                        return
+                    if not block:
+                        continue
+                    block = block[:end + 1 - offset]
+                    os.pwrite(fd, block, offset)
+                    offset += len(block)
+                    state["progress"](chunk, offset - start)
+                    if offset > end:
+                        break
+            if offset > end:
+                return
+            raise IOError(f"connection closed at byte {offset} of chunk {start}-{end}")
+        except (requests.exceptions.RequestException, IOError) as e:
+            if state["stop"].is_set():
+                return
+            if attempt == retries:
+                raise
+            time.sleep(min(2 ** attempt, 30))
+            state["log"](f"Retrying chunk {start}-{end} from byte {start + chunk['done']} ({e})")
+
+def publish_frontier(stream, frontier):
+    if stream is not None:
+        with stream["cond"]:
+            stream["frontier"] = frontier
+            stream["cond"].notify_all()
+
+def contiguous_bytes(chunks):
+    total = 0
+    for chunk in chunks:
+        total = chunk["start"] + chunk["done"]
+        if total <= chunk["end"]:
+            break
+    return total
+
+def download_stream(url, part_path, timeout=60, quiet=False, stream=None):
+    # Fallback for servers without Range support or a known size (e.g. on-the-fly GitLab archives).
+    downloaded = 0
+    last_report = 0
+    with requests.get(url, stream=True, timeout=(15, timeout)) as response:
         response.raise_for_status()
-        matches = re.findall(r'v(\d+\.\d+(?:\.\d+)?)', response.text)
-        versions = sorted(set(matches), key=lambda x: list(map(int, x.split("."))), reverse=True)
-        if not versions:
-            print_error("Could not detect Geant4 versions.")
-            sys.exit(1)
-        print_info("Available Geant4 versions:")
-        for i, ver in enumerate(versions[:5]):
-            print(f"  [{i+1}] v{ver}")
-        while True:
+        with open(part_path, "wb") as f:
+            for block in response.iter_content(1024 * 1024):
+                if stream is not None and stream["stop"].is_set():
+                    raise IOError("download cancelled")
+                f.write(block)
+                downloaded += len(block)
+                if stream is not None:
+                    f.flush()
+                    publish_frontier(stream, downloaded)
+                if not quiet and time.monotonic() - last_report > 1:
+                    last_report = time.monotonic()
+                    print(f"\r  {downloaded / 1048576:.1f} MiB", end="", flush=True)
+    if not quiet:
+        print()
+
+def download_file(url, dest, sha256=None, connections=4, chunk_size=8 * 1024 * 1024, quiet=False, stream=None):
+    part_path = dest + ".part"
+    journal_path = dest + ".journal"
+    if not quiet:
+        print_info(f"Downloading {url}")
+    try:
+        size, ranged = probe_download(url)
+        if size and ranged:
+            journal = load_download_journal(journal_path, url, size, chunk_size)
+            if journal is None or not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+                chunks = [{"start": start, "end": min(start + chunk_size, size) - 1, "done": 0}
+                          for start in range(0, size, chunk_size)]
+                journal = {"url": url, "size": size, "chunk_size": chunk_size, "chunks": chunks}
+                with open(part_path, "wb") as f:
+                    f.truncate(size)
+                save_download_journal(journal_path, journal)
+            elif not quiet:
+                done = sum(c["done"] for c in journal["chunks"])
+                print_info(f"Resuming download at {done / 1048576:.1f} of {size / 1048576:.1f} MiB")
+            pending = [c for c in journal["chunks"] if c["start"] + c["done"] <= c["end"]]
+            lock = threading.Lock()
+            last_report = [0.0]
+            started = time.monotonic()
+            base = sum(c["done"] for c in journal["chunks"])
+            publish_frontier(stream, contiguous_bytes(journal["chunks"]))
+
+            def progress(chunk, done):
+                with lock:
+                    chunk["done"] = done
+                    if stream is not None:
+                        publish_frontier(stream, contiguous_bytes(journal["chunks"]))
+                    now = time.monotonic()
+                    if now - last_report[0] < 1 and chunk["start"] + done <= chunk["end"]:
+                        return
+                    last_report[0] = now
+                    save_download_journal(journal_path, journal)
+                    if quiet:
+                        return
+                    total = sum(c["done"] for c in journal["chunks"])
+                    rate = (total - base) / max(now - started, 1e-3) / 1048576
+                    print(f"\r  {total / 1048576:.1f}/{size / 1048576:.1f} MiB  {rate:.1f} MiB/s", end="", flush=True)
+
+            def log(msg):
+                with lock:
+                    if not quiet:
+                        print()
+                    print_warning(msg)
+
+            stop = stream["stop"] if stream is not None else threading.Event()
+            state = {"progress": progress, "stop": stop, "log": log}
+            fd = os.open(part_path, os.O_WRONLY)
             try:
-                choice = int(input("Choose a version to install (1-5): ").strip())
-                if 1 <= choice <= 5:
-                    selected = versions[choice - 1]
-                    tarball_url = f"https://gitlab.cern.ch/geant4/geant4/-/archive/v{selected}/geant4-v{selected}.tar.gz"
-                    print_info(f"Checking if tarball exists: {tarball_url}")
-                    test_response = requests.head(tarball_url)
-                    if test_response.status_code != 200:
-                        print_warning(f"Could not find source tarball for v{selected}.")
-                        print_warning("This probably means it's not released yet.")
-                        print_action("Check your version or pick an older stable version.")
-                        try_again = input("Do you want to choose a different version? [Y/n]: ").strip().lower()
-                        if try_again != "n":
-                            continue
-                        else:
-                            sys.exit("Aborted by user.")
-                    return selected
-            except ValueError:
+                with ThreadPoolExecutor(max_workers=max(1, connections)) as pool:
+                    futures = [pool.submit(fetch_chunk, url, fd, chunk, state) for chunk in pending]
+                    try:
+                        for future in futures:
+                            future.result()
+                    except BaseException:
+                        state["stop"].set()
+                        for future in futures:
+                            future.cancel()
+                        raise
+            finally:
+                os.close(fd)
+                with lock:
+                    save_download_journal(journal_path, journal)
+            if not quiet:
+                print()
+        else:
+            if not quiet:
+                print_warning("Server does not support ranged downloads; using a single connection.")
+            download_stream(url, part_path, quiet=quiet, stream=stream)
+    except (requests.exceptions.RequestException, IOError) as e:
+        if not quiet:
+            print()
+        print_error(f"Download of {url} failed: {e}")
+        if os.path.exists(journal_path):
+            print_action("Progress was saved. Run the script again to resume the download.")
+        return False
+    if sha256:
+        actual = file_digest(part_path)
+        if actual.lower() != sha256.lower():
+            print_error(f"Checksum mismatch for {dest}: expected {sha256}, got {actual}")
+            os.remove(part_path)
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+            return False
+        if not quiet:
+            print_success("SHA-256 checksum verified.")
+    os.replace(part_path, dest)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+    with open(dest + ".sha256", "w") as f:
+        f.write(f"{sha256 or file_digest(dest)}  {os.path.basename(dest)}\n")
+    if not quiet:
+        print_success(f"Downloaded {dest}")
+    return True
+
+class PartialFileReader:
+    # File-like view of a .part file that is still being downloaded; reads block until the bytes have arrived.
+    def __init__(self, path, stream):
+        self.path = path
+        self.stream = stream
+        self.fd = None
+        self.pos = 0
+
+    def read(self, size=-1):
+        with self.stream["cond"]:
+            while self.stream["frontier"] <= self.pos and not self.stream["finished"]:
+                self.stream["cond"].wait()
+            available = self.stream["frontier"] - self.pos
+            if available <= 0:
+                if not self.stream["ok"]:
+                    raise IOError("download did not finish")
+                return b""
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDONLY)
+        size = available if size is None or size < 0 else min(size, available)
+        data = os.pread(self.fd, size, self.pos)
+        self.pos += len(data)
+        return data
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def extract_members(tar, dest_dir):
+    extracted, skipped = 0, 0
+    last_report = time.monotonic()
+    reported = False
+    for member in tar:
+        target = os.path.join(dest_dir, member.name)
+        if member.isfile():
+            try:
+                st = os.lstat(target)
+                if st.st_size == member.size and int(st.st_mtime) == int(member.mtime):
+                    skipped += 1
+                    continue
+            except OSError:
                 pass
-            print_warning("Invalid input. Try again.")
-    except requests.exceptions.RequestException as e:
-        print_error(f"Failed to retrieve Geant4 versions: {e}")
+        if hasattr(tarfile, "data_filter"):
+            tar.extract(member, dest_dir, filter="data")
+        else:
+            tar.extract(member, dest_dir)
+        if member.isdir():
+            continue
+        extracted += 1
+        if time.monotonic() - last_report > 2:
+            last_report = time.monotonic()
+            reported = True
+            print(f"\r  extracted {extracted} files", end="", flush=True)
+    if reported:
+        print()
+    return extracted, skipped
+
+def extract_tarball(tarball, dest_dir="."):
+    print_info(f"Extracting {tarball}")
+    try:
+        with tarfile.open(tarball, "r|*") as tar:
+            extracted, skipped = extract_members(tar, dest_dir)
+    except (tarfile.TarError, OSError, EOFError) as e:
+        print_error(f"Extracting {tarball} failed: {e}")
+        return False
+    print_success(f"Extracted {extracted} files ({skipped} already up to date).")
+    return True
+
+def download_and_extract(url, dest, src_dir, sha256=None, connections=4):
+    # Extract while downloading: tarfile reads the contiguous prefix of the .part file as chunks land.
+    stream = {"cond": threading.Condition(), "frontier": 0, "finished": False, "ok": False, "stop": threading.Event()}
+
+    def download():
+        ok = False
+        try:
+            ok = download_file(url, dest, sha256, connections, stream=stream)
+        finally:
+            with stream["cond"]:
+                stream["ok"] = ok
+                stream["finished"] = True
+                stream["cond"].notify_all()
+
+    downloader = threading.Thread(target=download, daemon=True)
+    downloader.start()
+    reader = PartialFileReader(dest + ".part", stream)
+    error = None
+    try:
+        with tarfile.open(fileobj=reader, mode="r|*") as tar:
+            extracted, skipped = extract_members(tar, os.path.dirname(src_dir) or ".")
+    except (tarfile.TarError, OSError, EOFError) as e:
+        error = e
+    except KeyboardInterrupt:
+        stream["stop"].set()
+        raise
+    finally:
+        reader.close()
+    downloader.join()
+    if not stream["ok"]:
+        if os.path.isdir(src_dir) and sha256 and not os.path.exists(dest + ".part"):
+            # The checksum did not match, so whatever we unpacked cannot be trusted.
+            shutil.rmtree(src_dir)
+        return False
+    if error is not None:
+        print_error(f"Extraction failed: {error}")
+        return extract_tarball(dest, os.path.dirname(src_dir) or ".")
+    print_success(f"Extracted {extracted} files ({skipped} already up to date).")
+    return True
+
+def verify_download(path, sha256=None):
+    expected = sha256
+    if expected is None and os.path.exists(path + ".sha256"):
+        with open(path + ".sha256", "r") as f:
+            expected = f.read().split()[0]
+    if expected is None:
+        return None
+    return file_digest(path).lower() == expected.lower()
+
+def get_cache_dir():
+    global args
+    if args is not None and getattr(args, "cache_dir", None):
+        return os.path.abspath(os.path.expanduser(args.cache_dir))
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "geant4-installer")
+
+def read_dataset_definitions(src_dir):
+    modules_dir = os.path.join(src_dir, "cmake", "Modules")
+    definitions = os.path.join(modules_dir, "G4DatasetDefinitions.cmake")
+    if not os.path.exists(definitions):
+        return [], None
+    with open(definitions, "r") as f:
+        text = f.read()
+    datasets = []
+    for block in re.findall(r"geant4_add_dataset\s*\((.*?)\)", text, re.S):
+        fields = dict(re.findall(r"^\s*([A-Z0-9_]+)\s+(\S+)", block, re.M))
+        if "NAME" not in fields or "VERSION" not in fields:
+            continue
+        if "SHA256SUM" in fields:
+            algorithm, checksum = "sha256", fields["SHA256SUM"]
+        elif "MD5SUM" in fields:
+            algorithm, checksum = "md5", fields["MD5SUM"]
+        else:
+            continue
+        filename = f"{fields.get('FILENAME', fields['NAME'])}.{fields['VERSION']}.{fields.get('EXTENSION', 'tar.gz')}"
+        datasets.append({"name": fields["NAME"], "version": fields["VERSION"], "filename": filename,
+                         "algorithm": algorithm, "checksum": checksum.lower()})
+    base_url = "https://cern.ch/geant4-data/datasets"
+    for module in os.listdir(modules_dir):
+        if module.endswith(".cmake"):
+            with open(os.path.join(modules_dir, module), "r", errors="replace") as f:
+                match = re.search(r'set\(GEANT4_DATASETS_URL\s+"([^"]+)"', f.read())
+            if match:
+                base_url = match.group(1)
+                break
+    return datasets, base_url
+
+def fetch_dataset(dataset, base_url, cache_dir):
+    object_path = os.path.join(cache_dir, "datasets", dataset["algorithm"], dataset["checksum"])
+    if os.path.exists(object_path):
+        return object_path, False
+    if args.offline:
+        print_error(f"Dataset {dataset['filename']} is not in the cache and --offline is set.")
+        return None, False
+    tmp_dir = os.path.join(cache_dir, "datasets", "tmp")
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, dataset["filename"])
+    if not download_file(f"{base_url}/{dataset['filename']}", tmp_path, connections=2, quiet=True):
+        return None, False
+    os.remove(tmp_path + ".sha256")
+    if file_digest(tmp_path, dataset["algorithm"]) != dataset["checksum"]:
+        print_error(f"Checksum mismatch for dataset {dataset['filename']}.")
+        os.remove(tmp_path)
+        return None, False
+    os.replace(tmp_path, object_path)
+    return object_path, True
+
+def link_or_copy(src, dest):
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+def seed_dataset(dataset, object_path, build_dir):
+    # Geant4 downloads each dataset via ExternalProject into Externals/<name>-<version>/src
+    # and skips the download when a file with the right hash is already sitting there.
+    external_src = os.path.join(build_dir, "Externals", f"{dataset['name']}-{dataset['version']}", "src")
+    os.makedirs(external_src, exist_ok=True)
+    link_or_copy(object_path, os.path.join(external_src, dataset["filename"]))
+    data_dir = os.path.join(build_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    # Unpack into a staging directory and rename into place when done, so a dataset directory
+    # only ever exists complete and its presence is enough to skip it next time.
+    with tarfile.open(object_path, "r:*") as tar:
+        first = tar.next()
+        if first is None or os.path.isdir(os.path.join(data_dir, first.name.split("/")[0])):
+            return
+        staging = tempfile.mkdtemp(prefix=".seed-", dir=data_dir)
+        try:
+            if hasattr(tarfile, "data_filter"):
+                tar.extractall(staging, filter="data")
+            else:
+                tar.extractall(staging)
+            for name in os.listdir(staging):
+                if not os.path.exists(os.path.join(data_dir, name)):
+                    os.rename(os.path.join(staging, name), os.path.join(data_dir, name))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+def prefetch_datasets(src_dir, build_dir):
+    datasets, base_url = read_dataset_definitions(src_dir)
+    if not datasets:
+        print_warning("No dataset definitions found in the source tree. Geant4 will download datasets itself.")
+        return True
+    cache_dir = get_cache_dir()
+    print_info(f"Fetching {len(datasets)} Geant4 datasets into cache {cache_dir}")
+    failed = []
+
+    def work(dataset):
+        object_path, downloaded = fetch_dataset(dataset, base_url, cache_dir)
+        if object_path is None:
+            failed.append(dataset["filename"])
+            return
+        seed_dataset(dataset, object_path, build_dir)
+        print_info(f"{dataset['filename']}: {'downloaded' if downloaded else 'cached'}")
+
+    with ThreadPoolExecutor(max_workers=max(1, args.connections)) as pool:
+        for future in [pool.submit(work, dataset) for dataset in datasets]:
+            try:
+                future.result()
+            except (OSError, tarfile.TarError) as e:
+                print_error(f"Failed to prepare dataset: {e}")
+                failed.append(str(e))
+    if failed:
+        print_warning(f"Could not prefetch: {', '.join(failed)}. Geant4 will try to download them during the build.")
+        return False
+    print_success("All Geant4 datasets are in place.")
+    return True
+
+GEANT4_TAGS_API = "https://gitlab.cern.ch/api/v4/projects/geant4%2Fgeant4/repository/tags?per_page=100"
+VERSION_INDEX_TTL = 24 * 3600
+
+def get_tarball_url(version, mirror=True):
+    tarball = f"geant4-v{version}.tar.gz"
+    if mirror and args is not None and args.mirror and not os.path.isdir(args.mirror):
+        return f"{args.mirror.rstrip('/')}/{tarball}"
+    return f"https://gitlab.cern.ch/geant4/geant4/-/archive/v{version}/{tarball}"
+
+def version_key(version):
+    return list(map(int, version.split(".")))
+
+def load_version_index():
+    try:
+        with open(os.path.join(get_cache_dir(), "versions.json"), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_version_index(index):
+    path = os.path.join(get_cache_dir(), "versions.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+def refresh_version_index(index):
+    headers = {"User-Agent": "Mozilla/5.0"}
+    if index and index.get("etag"):
+        headers["If-None-Match"] = index["etag"]
+    response = requests.get(GEANT4_TAGS_API, headers=headers, timeout=15)
+    if response.status_code == 304:
+        index["fetched_at"] = time.time()
+        return index
+    response.raise_for_status()
+    known = {entry["tag"]: entry for entry in (index or {}).get("versions", [])}
+    versions = []
+    for tag in response.json():
+        match = re.match(r"^v(\d+\.\d+(?:\.\d+)?)$", tag.get("name", ""))
+        if not match:
+            continue
+        entry = known.get(tag["name"], {"tag": tag["name"], "version": match.group(1),
+                                        "size": None, "available": None, "checked_at": 0})
+        entry["url"] = get_tarball_url(match.group(1), mirror=False)
+        versions.append(entry)
+    return {"fetched_at": time.time(), "etag": response.headers.get("ETag"), "versions": versions}
+
+def mirror_version_index(mirror_dir):
+    versions = []
+    for name in os.listdir(mirror_dir):
+        match = re.match(r"^geant4-v(\d+\.\d+(?:\.\d+)?)\.tar\.gz$", name)
+        if match:
+            path = os.path.join(mirror_dir, name)
+            versions.append({"tag": f"v{match.group(1)}", "version": match.group(1), "url": path,
+                             "size": os.path.getsize(path), "available": True, "checked_at": time.time()})
+    return {"fetched_at": time.time(), "etag": None, "versions": versions}
+
+def check_availability(entries):
+    def check(entry):
+        try:
+            response = requests.head(get_tarball_url(entry["version"]), allow_redirects=True, timeout=15)
+            entry["available"] = response.status_code == 200
+            length = response.headers.get("Content-Length")
+            entry["size"] = int(length) if length and length.isdigit() else entry.get("size")
+        except requests.exceptions.RequestException:
+            entry["available"] = None
+        entry["checked_at"] = time.time()
+
+    with ThreadPoolExecutor(max_workers=max(1, len(entries))) as pool:
+        list(pool.map(check, entries))
+
+def get_version_index():
+    if args.mirror and os.path.isdir(args.mirror):
+        return mirror_version_index(args.mirror)
+    index = load_version_index()
+    if args.offline:
+        if not index:
+            print_error("No cached version index. Run once with network access or pass --mirror <dir>.")
+            sys.exit(1)
+        print_info("Offline mode: using the cached version index.")
+        return index
+    if index and not args.refresh_versions and time.time() - index.get("fetched_at", 0) < VERSION_INDEX_TTL:
+        return index
+    try:
+        index = refresh_version_index(index)
+        save_version_index(index)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        if not index:
+            print_error(f"Failed to retrieve Geant4 versions: {e}")
+            sys.exit(1)
+        print_warning(f"Could not refresh the version list ({e}). Using the cached copy.")
+    return index
+
+def get_latest_geant4_version():
+    index = get_version_index()
+    entries = sorted(index["versions"], key=lambda entry: version_key(entry["version"]), reverse=True)
+    if args.geant4_version:
+        entries = [entry for entry in entries if entry["version"] == args.geant4_version] or \
+                  [{"tag": f"v{args.geant4_version}", "version": args.geant4_version,
+                    "url": get_tarball_url(args.geant4_version), "size": None, "available": None, "checked_at": 0}]
+    candidates = entries[:5]
+    if not candidates:
+        print_error("Could not detect Geant4 versions.")
         sys.exit(1)
+    stale = [entry for entry in candidates if entry.get("available") is None
+             or time.time() - entry.get("checked_at", 0) > VERSION_INDEX_TTL]
+    if stale and not args.offline:
+        check_availability(stale)
+        if not args.mirror and not args.geant4_version:
+            save_version_index(index)
+    if args.geant4_version:
+        if candidates[0].get("available") is False:
+            print_error(f"Could not find source tarball for v{args.geant4_version}.")
+            sys.exit(1)
+        return args.geant4_version
+    print_info("Available Geant4 versions:")
+    for i, entry in enumerate(candidates):
+        size = f"{entry['size'] / 1048576:.0f} MiB" if entry.get("size") else ""
+        note = {True: size, False: "not available", None: "unknown"}[entry.get("available")]
+        print(f"  [{i+1}] v{entry['version']}" + (f"  ({note})" if note else ""))
+    tried = set()
+    while True:
+        try:
+            if args.non_interactive:
+                untried = [i for i in range(1, len(candidates) + 1) if i not in tried]
+                if not untried:
+                    sys.exit("No downloadable Geant4 version found.")
+                choice = untried[0]
+                tried.add(choice)
+            else:
+                choice = int(input(f"Choose a version to install (1-{len(candidates)}): ").strip())
+            if 1 <= choice <= len(candidates):
+                selected = candidates[choice - 1]
+                if selected.get("available") is False:
+                    print_warning(f"Could not find source tarball for v{selected['version']}.")
+                    print_warning("This probably means it's not released yet.")
+                    print_action("Check your version or pick an older stable version.")
+                    try_again = prompt("Do you want to choose a different version? [Y/n]: ").strip().lower()
+                    if try_again != "n":
+                        continue
+                    else:
+                        sys.exit("Aborted by user.")
+                return selected["version"]
+        except ValueError:
+            pass
+        print_warning("Invalid input. Try again.")
 
-def install_packages(distro, geant_version):
+def fetch_source(tar_url, tarball, src_dir):
+    if args.mirror and os.path.isdir(args.mirror):
+        mirror_tarball = os.path.join(args.mirror, tarball)
+        if not os.path.exists(mirror_tarball):
+            print_error(f"{tarball} is not in the mirror {args.mirror}.")
+            return False
+        print_info(f"Using {mirror_tarball} from the local mirror.")
+        link_or_copy(mirror_tarball, tarball)
+        if args.sha256 and not verify_download(tarball, args.sha256):
+            print_error(f"Checksum mismatch for {tarball}.")
+            return False
+        return extract_tarball(tarball)
+    if args.offline:
+        print_error(f"{tarball} is not available offline. Pass --mirror <dir> with a copy of it.")
+        return False
+    return download_and_extract(tar_url, tarball, src_dir, args.sha256, args.connections)
+
+def get_distro_family(distro):
     distro_lower = distro.lower()
-    family = "unknown"
     if "arch" in distro_lower:
-        family = "arch"
+        return "arch"
+    elif any(name in distro_lower for name in ["ubuntu", "debian", "mint"]):
+        return "debian"
+    elif "opensuse" in distro_lower:
+        return "opensuse"
+    elif any(name in distro_lower for name in ["rocky", "rhel"]):
+        return "rhel"
+    elif "fedora" in distro_lower:
+        return "fedora"
+    return "unknown"
+
+def get_package_list(distro, geant_version):
+    family = get_distro_family(distro)
+    if family == "arch":
         base_packages = [
             "cmake", "gcc", "binutils", "libx11", "libxpm", "libxft", "libxext", "glew",
             "libjpeg-turbo", "libpng", "libtiff", "giflib", "libxml2", "openssl", "fftw",
-            "qt5-base", "qt5-tools", "mesa", "glu", "libxmu"
+            "qt5-base", "qt5-tools", "mesa", "glu", "libxmu", "ninja"
         ]
-        install_cmd = "sudo pacman -Sy --noconfirm"
-    elif any(name in distro_lower for name in ["ubuntu", "debian", "mint"]):
-        family = "debian"
+    elif family == "debian":
         base_packages = [
             "cmake-curses-gui", "cmake", "g++", "gcc", "binutils", "libx11-dev", "libxpm-dev",
             "libxft-dev", "libxext-dev", "libglew-dev", "libjpeg-dev", "libpng-dev",
             "libtiff-dev", "libgif-dev", "libxml2-dev", "libssl-dev", "libfftw3-dev",
             "qtbase5-dev", "qtchooser", "qttools5-dev-tools", "qt3d5-dev",
-            "libgl1-mesa-dev", "libglu1-mesa-dev", "libxmu-dev"
+            "libgl1-mesa-dev", "libglu1-mesa-dev", "libxmu-dev", "ninja-build"
         ]
-        install_cmd = "sudo apt update && sudo apt install -y"
-    elif "opensuse" in distro_lower:
-        family = "opensuse"
+    elif family == "opensuse":
         base_packages = [
             "cmake", "cmake-curses-gui", "cmake-gui", "gcc", "gcc-c++", "libX11-devel",
             "libXpm-devel", "libXft-devel", "libXext-devel", "glew-devel", "libjpeg-devel",
             "libpng-devel", "libtiff-devel", "giflib-devel", "libxml2-devel",
             "libopenssl-devel", "fftw3-devel", "libqt5-qtbase-devel", "libqt5-qttools-devel",
-            "libqt5-qt3d-devel", "Mesa-libGL-devel", "Mesa-libGLU-devel", "libXmu-devel"
+            "libqt5-qt3d-devel", "Mesa-libGL-devel", "Mesa-libGLU-devel", "libXmu-devel", "ninja"
         ]
-        install_cmd = "sudo zypper install -y"
-    elif any(name in distro_lower for name in ["rocky", "rhel"]):
-        family = "rhel"
+    elif family == "rhel":
         base_packages = [
             "cmake", "cmake-curses-gui", "cmake-gui", "gcc", "gcc-c++", "binutils",
             "libX11-devel", "libXpm-devel", "libXft-devel", "libXext-devel",
             "glew-devel", "libjpeg-turbo-devel", "libpng-devel", "libtiff-devel", "giflib-devel",
             "libxml2-devel", "openssl-devel", "fftw-devel", "qt5-qtbase-devel",
             "qt5-qttools-devel", "qt5-qt3d-devel", "mesa-libGL-devel",
-            "mesa-libGLU-devel", "libXmu-devel"
+            "mesa-libGLU-devel", "libXmu-devel", "ninja-build"
         ]
-        install_cmd = "sudo dnf install -y"
-    elif "fedora" in distro_lower:
-        family = "fedora"
+    elif family == "fedora":
         base_packages = [
             "cmake", "cmake-curses-gui", "cmake-gui", "gcc", "gcc-c++", "binutils",
             "qt5-qtbase-devel", "qt5-qttools-devel", "qt5-qt3d-devel", "glew-devel",
             "libjpeg-turbo-devel", "libpng-devel", "libtiff-devel", "giflib-devel",
             "libxml2-devel", "openssl-devel", "fftw-devel", "mesa-libGL-devel",
-            "mesa-libGLU-devel", "libXmu-devel"
+            "mesa-libGLU-devel", "libXmu-devel", "ninja-build"
         ]
-        install_cmd = "sudo dnf5 install -y" if "fedora 41" in distro_lower else "sudo dnf install -y"
     else:
-        print_warning("Distro not recognized. Please install dependencies manually.")
-        return
+        return None, []
     version_pkg_addons = {
         "11.2": {
             "debian": ["libtbb-dev"], "arch": ["tbb"], "fedora": ["tbb-devel"],
@@ -280,79 +1249,321 @@ def install_packages(distro, geant_version):
     }
     extra_packages = version_pkg_addons.get(geant_version, {}).get(family, [])
     all_packages = base_packages + extra_packages
-    pkg_cmd = f"{install_cmd} {' '.join(all_packages)}"
-    run_command(pkg_cmd, "Installing dependencies", interactive=True)
+    if args is not None and args.ccache:
+        all_packages.append("ccache")
+    return family, all_packages
+
+def get_missing_packages(family, packages):
+    if family == "debian":
+        command = ["dpkg-query", "-W", "-f=${Package} ${db:Status-Status}\n"] + packages
+    elif family == "arch":
+        command = ["pacman", "-Qq"] + packages
+    else:
+        command = ["rpm", "-q", "--qf", "%{NAME} installed\n"] + packages
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except OSError:
+        return None
+    installed = set()
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if (family == "arch" and len(fields) == 1) or (len(fields) == 2 and fields[1] == "installed"):
+            installed.add(fields[0])
+    return [package for package in packages if package not in installed]
+
+def get_install_command(family, distro, packages):
+    names = " ".join(packages)
+    cache = os.path.abspath(os.path.expanduser(args.package_cache)) if args.package_cache else None
+    if family == "debian":
+        # The apt front end drops the .debs after installing unless told to keep them.
+        options = f" -o Dir::Cache::archives={cache} -o APT::Keep-Downloaded-Packages=true" if cache else ""
+        if args.offline:
+            return f"sudo apt install -y --no-download{options} {names}"
+        return f"sudo apt update && sudo apt install -y{options} {names}"
+    if family == "arch":
+        options = f" --cachedir {cache}" if cache else ""
+        return f"sudo pacman -S{'' if args.offline else 'y'} --needed --noconfirm{options} {names}"
+    if family == "opensuse":
+        options = f" --pkg-cache-dir {cache}" if cache else ""
+        options += " --no-refresh" if args.offline else ""
+        install = f"sudo zypper{options} install -y"
+        if cache and not args.offline:
+            # zypper deletes the RPMs after installing unless they were fetched with --download-only first.
+            return f"{install} --download-only {names} && {install} {names}"
+        return f"{install} {names}"
+    dnf = "dnf5" if "fedora 41" in distro.lower() else "dnf"
+    options = f" --setopt=keepcache=True --setopt=cachedir={cache}" if cache else ""
+    options += " -C" if args.offline else ""
+    return f"sudo {dnf} install -y{options} {names}"
+
+def install_packages(distro, geant_version):
+    family, all_packages = get_package_list(distro, geant_version)
+    if family is None:
+        print_warning("Distro not recognized. Please install dependencies manually.")
+        return True
+    missing = get_missing_packages(family, all_packages)
+    if missing is None:
+        print_warning("Could not query the installed packages. Installing the full list.")
+        missing = all_packages
+    if not missing:
+        print_success(f"All {len(all_packages)} dependencies are already installed.")
+        return True
+    print_info(f"Missing {len(missing)} of {len(all_packages)} dependencies: {' '.join(missing)}")
+    if args.package_cache and family == "debian":
+        os.makedirs(os.path.join(os.path.expanduser(args.package_cache), "partial"), exist_ok=True)
+    return run_command(get_install_command(family, distro, missing), "Installing dependencies", interactive=True) == 0
+
+CMAKE_PRESETS = {
+    "vis-qt": {
+        "CMAKE_BUILD_TYPE": "Release",
+        "GEANT4_BUILD_MULTITHREADED": "ON",
+        "GEANT4_INSTALL_DATA": "ON",
+        "GEANT4_USE_OPENGL_X11": "ON",
+        "GEANT4_USE_QT": "ON",
+        "GEANT4_USE_RAYTRACER_X11": "ON",
+    },
+    "batch-mt": {
+        "CMAKE_BUILD_TYPE": "Release",
+        "GEANT4_BUILD_MULTITHREADED": "ON",
+        "GEANT4_INSTALL_DATA": "ON",
+        "GEANT4_USE_OPENGL_X11": "OFF",
+        "GEANT4_USE_QT": "OFF",
+        "GEANT4_USE_RAYTRACER_X11": "OFF",
+    },
+    "minimal": {
+        "CMAKE_BUILD_TYPE": "Release",
+        "GEANT4_BUILD_MULTITHREADED": "OFF",
+        "GEANT4_INSTALL_DATA": "OFF",
+        "GEANT4_USE_OPENGL_X11": "OFF",
+        "GEANT4_USE_QT": "OFF",
+    },
+}
+
+def load_presets(preset_file=None):
+    presets = {name: dict(options) for name, options in CMAKE_PRESETS.items()}
+    if not preset_file:
+        return presets
+    try:
+        with open(os.path.expanduser(preset_file), "r") as f:
+            user_presets = json.load(f)
+    except (OSError, ValueError) as e:
+        print_error(f"Could not read preset file {preset_file}: {e}")
+        sys.exit(1)
+    for name, preset in user_presets.items():
+        options = dict(presets.get(preset.get("inherits"), {}))
+        options.update({key: str(value) for key, value in preset.get("options", {}).items()})
+        presets[name] = options
+    return presets
+
+def get_cmake_options(preset_name, install_path):
+    presets = load_presets(args.preset_file)
+    if preset_name not in presets:
+        print_error(f"Unknown preset '{preset_name}'. Available presets: {', '.join(sorted(presets))}")
+        sys.exit(1)
+    options = dict(presets[preset_name])
+    for option in args.cmake_option or []:
+        key, _, value = option.partition("=")
+        options[key] = value
+    options["CMAKE_INSTALL_PREFIX"] = install_path
+    return options
+
+def get_cmake_generator():
+    if shutil.which("ninja") or shutil.which("ninja-build"):
+        return "Ninja"
+    print_warning("Ninja not found. Falling back to Unix Makefiles.")
+    return "Unix Makefiles"
+
+def read_cmake_cache_entry(key, build_dir="."):
+    try:
+        with open(os.path.join(build_dir, "CMakeCache.txt"), "r", errors="replace") as f:
+            for line in f:
+                if line.startswith(f"{key}:"):
+                    return line.split("=", 1)[1].strip()
+    except OSError:
+        pass
+    return None
+
+def configure_geant4(src_dir, options, preset_name):
+    generator = get_cmake_generator()
+    previous = read_cmake_cache_entry("CMAKE_GENERATOR")
+    if previous and previous != generator:
+        # CMake refuses to switch generators in an existing build dir (e.g. one left by the old Makefile flow).
+        print_warning(f"The build directory was configured with '{previous}'. Dropping its CMake cache to use {generator}.")
+        os.remove("CMakeCache.txt")
+        shutil.rmtree("CMakeFiles", ignore_errors=True)
+    print_info(f"Configuring with preset '{preset_name}' and the {generator} generator")
+    defines = " ".join(f'-D{key}="{value}"' for key, value in options.items())
+    return run_command(f'cmake -G "{generator}" {defines} {src_dir}', "Configuring Geant4")
 
 def verify_geant4_install(install_path):
     geant4_config = os.path.join(install_path, "bin", "geant4-config")
     if os.path.exists(geant4_config):
         result = subprocess.run([geant4_config, "--version"], capture_output=True, text=True)
-        print_success(f"Geant4 Version Installed: {result.stdout.strip()}")
+        if result.returncode == 0:
+            print_success(f"Geant4 Version Installed: {result.stdout.strip()}")
+            return True
+        print_warning(f"geant4-config failed: {result.stderr.strip()}")
     else:
         print_warning("geant4-config not found. Installation may not be correct.")
+    return False
+
+ARTIFACT_MANIFEST = ".geant4-artifact.json"
+ARTIFACT_IGNORED_OPTIONS = ("CMAKE_INSTALL_PREFIX", "CMAKE_JOB_POOLS", "CMAKE_JOB_POOL_COMPILE", "CMAKE_JOB_POOL_LINK",
+                            "CMAKE_C_COMPILER_LAUNCHER", "CMAKE_CXX_COMPILER_LAUNCHER")
+
+def get_artifact_key(version, preset_name, cmake_options, facts, distro):
+    release = facts["os_release"]
+    inputs = {
+        "version": version,
+        "preset": preset_name,
+        "options": {key: value for key, value in sorted(cmake_options.items()) if key not in ARTIFACT_IGNORED_OPTIONS},
+        "compiler": facts["versions"].get("g++"),
+        "distro": f"{get_distro_family(distro)}-{release.get('ID', '')}-{release.get('VERSION_ID', '')}",
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest(), inputs
+
+def find_artifact(store, version, key):
+    for extension in (".tar.zst", ".tar.gz"):
+        path = os.path.join(store, f"geant4-v{version}-{key[:16]}{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def relocate_install(install_path, old_prefix):
+    old, new = old_prefix.encode(), install_path.encode()
+    patchelf = shutil.which("patchelf")
+    patched = 0
+    for root, dirs, files in os.walk(install_path):
+        if re.search(r"/share/Geant4[^/]*$", root):
+            dirs[:] = [d for d in dirs if d != "data"]
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.islink(path):
+                continue
+            with open(path, "rb") as f:
+                head = f.read(8192)
+            if head.startswith(b"\x7fELF"):
+                # Binaries keep their RUNPATH; geant4.sh sets LD_LIBRARY_PATH, patchelf makes it tidy.
+                if patchelf and (root.endswith("/bin") or "/lib" in root):
+                    rpath = subprocess.run([patchelf, "--print-rpath", path], capture_output=True).stdout.strip()
+                    if old in rpath:
+                        subprocess.run([patchelf, "--set-rpath", rpath.replace(old, new), path], capture_output=True)
+                continue
+            if b"\0" in head:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            if old in data:
+                mode = os.stat(path).st_mode
+                with open(path, "wb") as f:
+                    f.write(data.replace(old, new))
+                os.chmod(path, mode)
+                patched += 1
+    return patched
+
+def store_artifact(install_path, store, version, key, inputs):
+    os.makedirs(store, exist_ok=True)
+    manifest = dict(inputs, key=key, prefix=install_path, created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    # The install tree is usually root-owned after `sudo cmake --install`, so the manifest is added from a temp dir.
+    manifest_dir = tempfile.mkdtemp(prefix="geant4-artifact-")
+    with open(os.path.join(manifest_dir, ARTIFACT_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1)
+    if shutil.which("zstd"):
+        extension, compress = ".tar.zst", '-I "zstd -T0 -3"'
+    else:
+        extension, compress = ".tar.gz", "-z"
+    archive = os.path.join(store, f"geant4-v{version}-{key[:16]}{extension}")
+    tmp_archive = f"{archive}.{os.getpid()}.tmp"
+    status = run_command(f'tar {compress} -cf "{tmp_archive}" -C "{install_path}" --exclude=./{ARTIFACT_MANIFEST} . '
+                         f'-C "{manifest_dir}" {ARTIFACT_MANIFEST}', "Packing install artifact")
+    shutil.rmtree(manifest_dir)
+    if status != 0:
+        if os.path.exists(tmp_archive):
+            os.remove(tmp_archive)
+        return None
+    os.replace(tmp_archive, archive)
+    with open(archive + ".json", "w") as f:
+        json.dump(manifest, f, indent=1)
+    print_success(f"Stored prebuilt artifact {archive}")
+    return archive
+
+def restore_artifact(archive, install_path):
+    print_info(f"Restoring prebuilt Geant4 from {archive}")
+    # Unpack next to the install path and swap it in afterwards, so a failed restore leaves the old install alone.
+    staging = f"{install_path}.restore-{os.getpid()}"
+    decompress = '-I zstd' if archive.endswith(".tar.zst") else "-z"
+    try:
+        os.makedirs(staging)
+        if run_command(f'tar -C "{staging}" {decompress} -xf "{archive}"', "Unpacking install artifact") != 0:
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+        with open(os.path.join(staging, ARTIFACT_MANIFEST), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print_warning(f"Could not unpack the artifact: {e}")
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    old_install = f"{install_path}.old-{os.getpid()}"
+    try:
+        if os.path.exists(install_path):
+            os.rename(install_path, old_install)
+        os.rename(staging, install_path)
+    except OSError as e:
+        print_warning(f"Could not replace {install_path}: {e}")
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    if os.path.exists(old_install):
+        try:
+            shutil.rmtree(old_install)
+        except OSError:
+            # Earlier builds were installed with sudo, so the old tree is usually root-owned.
+            if run_command(f'sudo rm -rf "{old_install}"', "Removing the previous install") != 0:
+                print_warning(f"Could not remove the previous install; it is left in {old_install}")
+    if manifest["prefix"] != install_path:
+        patched = relocate_install(install_path, manifest["prefix"])
+        print_info(f"Relocated {patched} files from {manifest['prefix']} to {install_path}")
+    return verify_geant4_install(install_path)
+
+def append_to_bashrc(line):
+    bashrc_path = os.path.expanduser("~/.bashrc")
+    if os.path.exists(bashrc_path):
+        with open(bashrc_path, "r") as bashrc_file:
+            if line in (existing.strip() for existing in bashrc_file):
+                return False
+    with open(bashrc_path, "a") as bashrc_file:
+        bashrc_file.write(f"\n{line}\n")
+    return True
 
 def add_versioned_alias(version, install_path):
     alias_name = f"geant4-{version.replace('.', '_')}"
     alias_command = f'alias {alias_name}="source {install_path}/bin/geant4.sh"'
-    bashrc_path = os.path.expanduser("~/.bashrc")
-    with open(bashrc_path, "a") as bashrc_file:
-        bashrc_file.write(f"\n{alias_command}\n")
-    print_success(f"Alias '{alias_name}' added to ~/.bashrc")
+    if append_to_bashrc(alias_command):
+        print_success(f"Alias '{alias_name}' added to ~/.bashrc")
+    else:
+        print_info(f"Alias '{alias_name}' is already in ~/.bashrc")
 
-def get_script_directory():
-    return os.path.dirname(os.path.abspath(__file__))
+def setup_ccache(base_dir):
+    ccache = shutil.which("ccache")
+    if ccache is None:
+        print_warning("ccache not found. Building without a compiler cache.")
+        return None
+    ccache_dir = os.path.join(get_cache_dir(), "ccache")
+    os.makedirs(ccache_dir, exist_ok=True)
+    os.environ["CCACHE_DIR"] = ccache_dir
+    # Hash paths relative to the Geant4 folder so different versions and build dirs share hits.
+    os.environ["CCACHE_BASEDIR"] = base_dir
+    os.environ["CCACHE_NOHASHDIR"] = "1"
+    run_command(f"{ccache} --max-size={args.ccache_size}", silent=True)
+    run_command(f"{ccache} --zero-stats", silent=True)
+    print_info(f"Using ccache in {ccache_dir} (max {args.ccache_size})")
+    return ccache
 
-def install_geant4():
-    parser = argparse.ArgumentParser(description="Geant4 Installation Script")
-    parser.add_argument("-n", "--non-interactive", action="store_true", help="Run in non-interactive mode")
-    parser.add_argument("-y", "--yes-to-all", action="store_true", help="Answer yes to all prompts")
-    global args
-    args = parser.parse_args()
-    os_type, distro = detect_os()
-    if os_type == "Windows":
-        print_warning("Script only supports Linux or WSL. Windows script is under development.")
-        sys.exit(1)
-    script_dir = get_script_directory()
-    geant4_dir = os.path.join(script_dir, "Geant4")
-    os.makedirs(geant4_dir, exist_ok=True)
-    os.chdir(geant4_dir)
-    version = get_latest_geant4_version()
-    tarball = f"geant4-v{version}.tar.gz"
-    tar_url = f"https://gitlab.cern.ch/geant4/geant4/-/archive/v{version}/{tarball}"
-    src_dir = f"geant4-v{version}"
-    build_dir = f"geant4-v{version}-build"
-    if os.path.exists(tarball):
-        print_warning(f"{tarball} already exists.")
-        choice = input("Do you want to [R]edownload, [S]kip, or [A]bort? (R/S/A): ").strip().lower()
-        if choice == 'r':
-            run_command(f"rm -f {tarball}", "Removing existing tarball")
-            run_command(f"wget {tar_url}", "Downloading Geant4 source")
-        elif choice == 's':
-            print_info("Skipping download and extraction.")
-        else:
-            print_info("Aborting.")
-            sys.exit(0)
-    else:
-        run_command(f"wget {tar_url}", "Downloading Geant4 source")
-    if not (os.path.exists(src_dir) and os.listdir(src_dir)):
-        run_command(f"tar -xvzf {tarball}", "Extracting Geant4 source")
-    if os.path.exists(build_dir) and os.listdir(build_dir):
-        print_warning(f"Build directory '{build_dir}' is not empty.")
-        choice = input("[C]lear, [S]kip, or [A]bort? (C/S/A): ").strip().lower()
-        if choice == 'c':
-            run_command(f"rm -rf {build_dir}", "Clearing build directory")
-            os.makedirs(build_dir)
-        elif choice == 's':
-            print_info("Continuing with existing build directory.")
-        else:
-            print_info("Aborting.")
-            sys.exit(0)
-    else:
-        os.makedirs(build_dir)
-    os.chdir(build_dir)
-    install_packages(distro, version)
-    install_path = os.path.join(script_dir, "Geant4", f"geant4-v{version}-install")
-    print_info(f"Install path: {install_path}")
+def print_ccache_stats(ccache):
+    result = subprocess.run([ccache, "--show-stats"], capture_output=True, text=True)
+    if result.returncode == 0:
+        print_info(f"ccache statistics for this build:\n{result.stdout.strip()}")
+
+def run_interactive_cmake(src_dir, install_path, defines=""):
     instructions = f"""
 [INSTRUCTIONS]
 1. After CMake opens, it’ll greet you with an empty void labeled: EMPTY CACHE
@@ -391,23 +1602,98 @@ def install_geant4():
         print_warning("GUI open failed. Falling back to terminal display.")
         run_command("less geant4_install_instructions.txt", "Displaying instructions in terminal", interactive=True)
     input("Press Enter to open CMake configuration...")
-    run_command(f"ccmake ../{src_dir}", "Running CMake", interactive=True)
+    run_command(f"ccmake {defines} {src_dir}", "Running CMake", interactive=True)
     input("Press Enter after completing CMake configuration to continue...")
-    cores = get_cpu_cores()
-    run_command(f"make -j{cores}", "Compiling Geant4")
-    run_command("sudo make install", "Installing Geant4")
-    print_success("Geant4 installed successfully.")
-    verify_geant4_install(install_path)
+
+def load_install_state(path):
+    try:
+        with open(path, "r") as f:
+            phases = json.load(f).get("phases", {})
+    except (OSError, ValueError):
+        phases = {}
+    return {"path": path, "phases": phases, "rerun": set()}
+
+def save_install_state(state):
+    tmp_path = state["path"] + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"phases": state["phases"]}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, state["path"])
+
+def fingerprint(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+def phase_is_current(state, name, inputs, outputs, after=()):
+    record = state["phases"].get(name)
+    if not record or record["inputs"] != fingerprint(inputs) or state["rerun"].intersection(after):
+        return False
+    return outputs() == record["outputs"]
+
+def run_phase(state, name, inputs, action, outputs=lambda: "", after=(), fatal=True):
+    # A phase is skipped when its inputs match the last successful run, its outputs are still
+    # in place and none of the phases it depends on had to run again in this session.
+    if phase_is_current(state, name, inputs, outputs, after):
+        print_info(f"Phase '{name}' is up to date, skipping.")
+        return True
+    state["rerun"].add(name)
+    state["phases"].pop(name, None)
+    save_install_state(state)
+    with timed_phase(name):
+        ok = action() is not False
+    if not ok:
+        if fatal:
+            print_error(f"Phase '{name}' failed. Fix the problem and rerun the installer to continue from here.")
+            sys.exit(1)
+        return False
+    result = outputs()
+    if result is not None:
+        state["phases"][name] = {"inputs": fingerprint(inputs), "outputs": result,
+                                 "completed": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        save_install_state(state)
+    return True
+
+def source_outputs(tarball, src_dir):
+    if not os.path.exists(os.path.join(src_dir, "CMakeLists.txt")) or not os.path.exists(tarball):
+        return None
+    if os.path.exists(tarball + ".sha256"):
+        with open(tarball + ".sha256", "r") as f:
+            return f.read().split()[0]
+    return file_digest(tarball)
+
+def dataset_outputs(src_dir, build_dir):
+    datasets, _ = read_dataset_definitions(src_dir)
+    return fingerprint(sorted(dataset["filename"] for dataset in datasets if os.path.exists(os.path.join(
+        build_dir, "Externals", f"{dataset['name']}-{dataset['version']}", "src", dataset["filename"]))))
+
+def configure_outputs(build_dir):
+    if not os.path.exists(os.path.join(build_dir, "CMakeCache.txt")):
+        return None
+    for build_file in ("build.ninja", "Makefile"):
+        if os.path.exists(os.path.join(build_dir, build_file)):
+            # The job pools are baked into build.ninja, so a build that had to shrink them reconfigures next time.
+            return f"{build_file} {read_cmake_cache_entry('CMAKE_JOB_POOLS', build_dir) or ''}".strip()
+    return None
+
+def install_outputs(build_dir):
+    manifest = os.path.join(build_dir, "install_manifest.txt")
+    if not os.path.exists(manifest):
+        return None
+    with open(manifest, "r") as f:
+        installed = f.read()
+    if not all(os.path.lexists(path) for path in installed.splitlines() if path):
+        return None
+    return hashlib.sha256(installed.encode()).hexdigest()
+
+def get_script_directory():
+    return os.path.dirname(os.path.abspath(__file__))
+
+def finish_install(version, install_path, cores):
     add_versioned_alias(version, install_path)
     major_version = int(version.split(".")[0])
     if major_version < 11:
-        bashrc_path = os.path.expanduser("~/.bashrc")
-        setup_command = f"source {install_path}/bin/geant4.sh"
-        with open(bashrc_path, "a") as bashrc:
-            bashrc.write(f"\n{setup_command}\n")
-        print_info("Geant4 environment setup added to ~/.bashrc")
+        if append_to_bashrc(f"source {install_path}/bin/geant4.sh"):
+            print_info("Geant4 environment setup added to ~/.bashrc")
         print_info("Run 'source ~/.bashrc' or restart terminal to apply changes.")
-    choice = input("Do you want to build and run Example B1 to verify installation? (y/n): ").strip().lower()
+    choice = prompt("Do you want to build and run Example B1 to verify installation? (y/n): ").strip().lower()
     if choice == 'y':
         geant4_examples_path = os.path.join(install_path, "share", "Geant4", "examples", "basic", "B1")
         user_example_path = os.path.expanduser("~/geant4-example-B1")
@@ -415,22 +1701,200 @@ def install_geant4():
         geant4_cmake_dir = os.path.join(install_path, "lib", "cmake", "Geant4")
         geant4_env_script = os.path.join(install_path, "bin", "geant4.sh")
         try:
-            print_info("Copying Example B1 to a writable directory...")
-            if os.path.exists(user_example_path):
-                shutil.rmtree(user_example_path)
-            shutil.copytree(geant4_examples_path, user_example_path)
-            os.makedirs(build_path, exist_ok=True)
-            os.chdir(build_path)
-            cmake_command = f"cmake -DGeant4_DIR={geant4_cmake_dir} .."
-            run_command(cmake_command, "Configuring Example B1")
-            run_command(f"make -j{cores}", "Building Example B1")
-            print_info("Running Example B1...")
-            subprocess.run(f"bash -c 'source {geant4_env_script} && ./exampleB1'", shell=True, check=True)
+            with timed_phase("verify (Example B1)"):
+                print_info("Copying Example B1 to a writable directory...")
+                if os.path.exists(user_example_path):
+                    shutil.rmtree(user_example_path)
+                shutil.copytree(geant4_examples_path, user_example_path)
+                os.makedirs(build_path, exist_ok=True)
+                os.chdir(build_path)
+                cmake_command = f"cmake -DGeant4_DIR={geant4_cmake_dir} .."
+                run_command(cmake_command, "Configuring Example B1")
+                run_command(f"make -j{cores}", "Building Example B1", log_name="example-B1")
+                if args.non_interactive or args.yes_to_all:
+                    # Without a macro B1 opens an interactive UI session, which would wait forever on a headless node.
+                    print_info("Running Example B1 in batch mode with exampleB1.in...")
+                    subprocess.run(f"bash -c 'source {geant4_env_script} && ./exampleB1 exampleB1.in'", shell=True,
+                                   check=True, stdin=subprocess.DEVNULL, timeout=600)
+                else:
+                    print_info("Running Example B1...")
+                    subprocess.run(f"bash -c 'source {geant4_env_script} && ./exampleB1'", shell=True, check=True)
             print_success("Example B1 ran successfully. Geant4 is working.")
         except Exception as e:
             print_error(f"Failed during Example B1 verification: {e}")
     else:
         print_success("Installation completed. You can manually test Geant4 later.")
 
+def install_geant4():
+    parser = argparse.ArgumentParser(description="Geant4 Installation Script")
+    parser.add_argument("-n", "--non-interactive", action="store_true", help="Run in non-interactive mode")
+    parser.add_argument("-y", "--yes-to-all", action="store_true", help="Answer yes to all prompts")
+    parser.add_argument("--geant4-version", help="Install this Geant4 version (e.g. 11.2.1) instead of choosing from a list")
+    parser.add_argument("--offline", action="store_true", help="Do not touch the network; use the cached version list, datasets and --mirror")
+    parser.add_argument("--mirror", help="Local directory or URL holding geant4-v<version>.tar.gz files")
+    parser.add_argument("--package-cache", help="Keep downloaded system packages in this directory for offline reinstalls")
+    parser.add_argument("--refresh-versions", action="store_true", help="Refresh the cached Geant4 version list now")
+    parser.add_argument("--sha256", help="Expected SHA-256 of the Geant4 source tarball")
+    parser.add_argument("--cache-dir", help="Cache directory shared by all installs (default: ~/.cache/geant4-installer)")
+    parser.add_argument("--skip-datasets", action="store_true", help="Let the Geant4 build download its datasets itself")
+    parser.add_argument("--preset", default="vis-qt", help="CMake configuration preset: vis-qt, batch-mt, minimal or one from --preset-file (default: vis-qt)")
+    parser.add_argument("--preset-file", help="JSON file with extra presets, e.g. {\"mine\": {\"inherits\": \"batch-mt\", \"options\": {\"GEANT4_USE_GDML\": \"ON\"}}}")
+    parser.add_argument("--cmake-option", action="append", metavar="KEY=VALUE", help="Extra CMake cache entry on top of the preset (repeatable)")
+    parser.add_argument("--ccmake", action="store_true", help="Configure interactively with ccmake instead of a preset")
+    parser.add_argument("--ccache", action="store_true", help="Compile through ccache so rebuilds reuse object files")
+    parser.add_argument("--ccache-size", default="10G", help="Size cap for the ccache directory (default: 10G)")
+    parser.add_argument("-j", "--jobs", type=int, help="Parallel build jobs (default: worked out from usable CPUs and free memory)")
+    parser.add_argument("--artifact-store", help="Directory (local or shared) of prebuilt install archives to restore from and publish to")
+    parser.add_argument("--connections", type=int, default=4, help="Parallel connections used for downloads (default: 4)")
+    global args
+    args = parser.parse_args()
+    ensure_basic_utilities()
+    os_type, distro = detect_os(get_host_facts())
+    if os_type == "Windows":
+        print_warning("Script only supports Linux or WSL. Windows script is under development.")
+        sys.exit(1)
+    script_dir = get_script_directory()
+    geant4_dir = os.path.join(script_dir, "Geant4")
+    os.makedirs(geant4_dir, exist_ok=True)
+    os.chdir(geant4_dir)
+    version = get_latest_geant4_version()
+    global log_dir
+    log_dir = os.path.join(geant4_dir, "logs", f"v{version}")
+    tarball = f"geant4-v{version}.tar.gz"
+    tar_url = get_tarball_url(version)
+    src_dir = f"geant4-v{version}"
+    build_dir = f"geant4-v{version}-build"
+    atexit.register(write_profile_report, log_dir, os.path.abspath(build_dir))
+    install_path = os.path.join(script_dir, "Geant4", f"geant4-v{version}-install")
+    cmake_options = get_cmake_options(args.preset, install_path)
+    state = load_install_state(os.path.join(geant4_dir, f"geant4-v{version}.state.json"))
+    resumed = bool(state["phases"])
+    package_family, package_list = get_package_list(distro, version)
+
+    def package_outputs():
+        if package_family is None:
+            return ""
+        return fingerprint(package_list) if get_missing_packages(package_family, package_list) == [] else None
+
+    def packages():
+        if not install_packages(distro, version):
+            print_warning("Installing dependencies failed. Continuing, but the build may fail.")
+            return False
+        if args.ccmake or cmake_options.get("GEANT4_USE_QT") == "ON":
+            check_dependencies(get_host_facts())
+
+    run_phase(state, "packages", {"packages": package_list}, packages, package_outputs, fatal=False)
+    artifact_key = None
+    if args.artifact_store:
+        # get_host_facts() re-probes once g++ appears or changes, so the key names the compiler the packages phase installed.
+        facts = get_host_facts()
+        if facts["versions"].get("g++") is None:
+            print_warning("Could not determine the g++ version. Not using the artifact store.")
+        else:
+            artifact_key, artifact_inputs = get_artifact_key(version, args.preset, cmake_options, facts, distro)
+    if artifact_key:
+        archive = find_artifact(os.path.expanduser(args.artifact_store), version, artifact_key)
+        if archive and not args.ccmake:
+            manifest = os.path.join(install_path, ARTIFACT_MANIFEST)
+            restored = run_phase(state, "restore artifact", {"archive": archive},
+                                 lambda: restore_artifact(archive, install_path),
+                                 lambda: file_digest(manifest) if os.path.exists(manifest) else None, fatal=False)
+            if restored:
+                print_success(f"Geant4 {version} restored from a prebuilt artifact.")
+                finish_install(version, install_path, get_cpu_cores())
+                return
+            print_warning("Restoring the artifact failed. Building from source instead.")
+        else:
+            print_info(f"No prebuilt artifact for this configuration (key {artifact_key[:16]}). Building from source.")
+
+    def fetch():
+        if os.path.exists(tarball):
+            verified = verify_download(tarball, args.sha256)
+            if verified is False:
+                print_warning(f"{tarball} exists but does not match its checksum. Downloading again.")
+                os.remove(tarball)
+            elif verified is None and not resumed:
+                print_warning(f"{tarball} already exists.")
+                choice = prompt("Do you want to [R]edownload, [S]kip, or [A]bort? (R/S/A): ", 's').strip().lower()
+                if choice == 'r':
+                    run_command(f"rm -f {tarball}", "Removing existing tarball")
+                elif choice == 's':
+                    print_info("Skipping download.")
+                else:
+                    print_info("Aborting.")
+                    sys.exit(0)
+        if not os.path.exists(tarball):
+            return fetch_source(tar_url, tarball, src_dir)
+        return extract_tarball(tarball)
+
+    run_phase(state, "download+extract", {"url": tar_url, "sha256": args.sha256}, fetch,
+              lambda: source_outputs(tarball, src_dir))
+    if os.path.exists(build_dir) and os.listdir(build_dir) and not resumed:
+        print_warning(f"Build directory '{build_dir}' is not empty.")
+        choice = prompt("[C]lear, [S]kip, or [A]bort? (C/S/A): ", 's').strip().lower()
+        if choice == 'c':
+            run_command(f"rm -rf {build_dir}", "Clearing build directory")
+            os.makedirs(build_dir)
+        elif choice == 's':
+            print_info("Continuing with existing build directory.")
+        else:
+            print_info("Aborting.")
+            sys.exit(0)
+    else:
+        os.makedirs(build_dir, exist_ok=True)
+    os.chdir(build_dir)
+    source = os.path.join("..", src_dir)
+    print_info(f"Install path: {install_path}")
+    cores = get_cpu_cores()
+    link_jobs = get_link_jobs(cores)
+    if not args.skip_datasets and (args.ccmake or cmake_options.get("GEANT4_INSTALL_DATA") == "ON"):
+        run_phase(state, "datasets", {"cache": get_cache_dir()}, lambda: prefetch_datasets(source, "."),
+                  lambda: dataset_outputs(source, "."), after=("download+extract",), fatal=False)
+    ccache = setup_ccache(geant4_dir) if args.ccache else None
+    if ccache:
+        cmake_options["CMAKE_C_COMPILER_LAUNCHER"] = ccache
+        cmake_options["CMAKE_CXX_COMPILER_LAUNCHER"] = ccache
+    configure_inputs = {"preset": args.preset, "options": dict(cmake_options), "ccmake": args.ccmake,
+                        "generator": get_cmake_generator()}
+    cmake_options["CMAKE_JOB_POOLS"] = f"compile={cores};link={link_jobs}"
+    cmake_options["CMAKE_JOB_POOL_COMPILE"] = "compile"
+    cmake_options["CMAKE_JOB_POOL_LINK"] = "link"
+    if not args.ccmake:
+        configure_inputs["job_pools"] = cmake_options["CMAKE_JOB_POOLS"]
+
+    def configure():
+        if args.ccmake:
+            launcher = f"-DCMAKE_C_COMPILER_LAUNCHER={ccache} -DCMAKE_CXX_COMPILER_LAUNCHER={ccache}" if ccache else ""
+            run_interactive_cmake(source, install_path, launcher)
+        elif configure_geant4(source, cmake_options, args.preset) != 0:
+            print_error("CMake configuration failed. Check the output above.")
+            return False
+
+    def shrink_job_pools(jobs):
+        run_command(f'cmake -DCMAKE_JOB_POOLS="compile={jobs};link={min(link_jobs, jobs)}" .',
+                    "Shrinking the build job pools")
+
+    def build():
+        build_status = run_build("cmake --build . --parallel {jobs}", cores, "Compiling Geant4", log_name="build",
+                                 on_retry=None if args.ccmake else shrink_job_pools)
+        if ccache:
+            print_ccache_stats(ccache)
+        return build_status == 0
+
+    run_phase(state, "configure", configure_inputs, configure, lambda: configure_outputs("."),
+              after=("download+extract", "packages"))
+    run_phase(state, "compile", configure_inputs, build, after=("configure", "datasets"))
+    run_phase(state, "install", {"prefix": install_path},
+              lambda: run_command("sudo cmake --build . --target install", "Installing Geant4", log_name="install") == 0,
+              lambda: install_outputs("."), after=("compile",))
+    print_success("Geant4 installed successfully.")
+    verify_geant4_install(install_path)
+    if artifact_key and not args.ccmake:
+        store = os.path.abspath(os.path.expanduser(args.artifact_store))
+        run_phase(state, "publish artifact", {"store": store, "key": artifact_key},
+                  lambda: store_artifact(install_path, store, version, artifact_key, artifact_inputs),
+                  lambda: find_artifact(store, version, artifact_key), after=("install",), fatal=False)
+    finish_install(version, install_path, cores)
+
 if __name__ == "__main__":
     install_geant4()
@@ -0,0 +1,199 @@
+# Measures how the Geant4_Project `sim` application scales with threads, events and beam energy.
+# Builds sim, runs every point of the grid a few times with its own generated macro, and reports
+# events/s, parallel efficiency, peak RSS and output size as a table and as JSON. Run it once per
+# node type to pick a thread count, and again after moving to a new Geant4 version to spot regressions.
+#
+#   python3 sim_benchmark.py --geant4-prefix Geant4/geant4-v11.3.1-install --threads 1,2,4,8 --events 10000
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RUN_TIMER = re.compile(r"Real=([\d.eE+-]+)s")
+
+def parse_list(text, kind=int):
+    return [kind(value) for value in text.split(",") if value.strip()]
+
+def geant4_command(command, prefix):
+    if prefix:
+        return ["bash", "-c", f'source "{os.path.join(prefix, "bin", "geant4.sh")}" && {command}']
+    return ["bash", "-c", command]
+
+def build_sim(project_dir, build_dir, prefix, jobs):
+    os.makedirs(build_dir, exist_ok=True)
+    configure = f'cmake -S "{project_dir}" -B "{build_dir}" -DCMAKE_BUILD_TYPE=Release'
+    if prefix:
+        configure += f' -DGeant4_DIR="{os.path.join(prefix, "lib", "cmake", "Geant4")}"'
+    for command in (configure, f'cmake --build "{build_dir}" --parallel {jobs}'):
+        if subprocess.run(geant4_command(command, prefix)).returncode != 0:
+            sys.exit(f"Building sim failed: {command}")
+    sim = os.path.join(build_dir, "sim")
+    if not os.path.exists(sim):
+        sys.exit(f"{sim} was not produced by the build.")
+    return sim
+
+def write_macro(path, threads, events, energy, warmup, record_mode=None):
+    lines = [
+        "/control/verbose 0",
+        "/run/verbose 1",
+        "/event/verbose 0",
+        "/tracking/verbose 0",
+        f"/run/numberOfThreads {threads}",
+    ]
+    if record_mode:
+        lines.append(f"/PM/detector/recordMode {record_mode}")
+    lines += [
+        "/run/initialize",
+        f"/gun/energy {energy} MeV",
+    ]
+    # The first run of each worker also builds its physics tables, so an optional short warm-up
+    # run keeps that start-up cost out of the measured one.
+    if warmup:
+        lines.append(f"/run/beamOn {warmup}")
+    lines.append(f"/run/beamOn {events}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def output_size(run_dir, run_id):
+    pattern = re.compile(rf"output{run_id}(_t\d+)?\.\w+$")
+    return sum(os.path.getsize(os.path.join(run_dir, name)) for name in os.listdir(run_dir) if pattern.match(name))
+
+def run_once(sim, prefix, run_dir, threads, events, energy, warmup, record_mode=None):
+    if os.path.exists(run_dir):
+        shutil.rmtree(run_dir)
+    os.makedirs(run_dir)
+    write_macro(os.path.join(run_dir, "bench.mac"), threads, events, energy, warmup, record_mode)
+    log_path = os.path.join(run_dir, "sim.log")
+    started = time.perf_counter()
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(geant4_command(f'exec "{sim}" bench.mac', prefix), cwd=run_dir,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except KeyboardInterrupt:
+            process.kill()
+            raise
+    wall = time.perf_counter() - started
+    returncode = os.waitstatus_to_exitcode(status)
+    if returncode != 0:
+        print(f"  sim exited with {returncode}, see {log_path}")
+        return None
+    # With /run/verbose 1 the master prints the event-loop timer after every run; worker
+    # lines carry a G4WT prefix and are ignored.
+    loop_time = None
+    with open(log_path, "r", errors="replace") as log:
+        for line in log:
+            match = RUN_TIMER.search(line)
+            if match and not line.startswith("G4WT"):
+                loop_time = float(match.group(1))
+    if not loop_time:
+        loop_time = wall
+    return {
+        "wall_s": round(wall, 3),
+        "event_loop_s": round(loop_time, 3),
+        "events_per_s": round(events / loop_time, 2),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "output_bytes": output_size(run_dir, 1 if warmup else 0),
+    }
+
+def summarize(config, runs):
+    rates = [run["events_per_s"] for run in runs]
+    return dict(config, **{
+        "repeats": len(runs),
+        "events_per_s": round(statistics.median(rates), 2),
+        "events_per_s_stdev": round(statistics.stdev(rates), 2) if len(rates) > 1 else 0.0,
+        "event_loop_s": round(statistics.median(run["event_loop_s"] for run in runs), 3),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "output_bytes": max(run["output_bytes"] for run in runs),
+        "runs": runs,
+    })
+
+def add_efficiency(results):
+    # Efficiency is measured against the smallest thread count of the same events/energy point,
+    # so it is the usual T(1)/(n*T(n)) whenever 1 thread is part of the grid.
+    for result in results:
+        baseline = min((other for other in results
+                        if other["events"] == result["events"] and other["energy_mev"] == result["energy_mev"]),
+                       key=lambda other: other["threads"])
+        speedup = result["events_per_s"] / baseline["events_per_s"]
+        result["speedup"] = round(speedup, 2)
+        result["parallel_efficiency"] = round(speedup * baseline["threads"] / result["threads"], 3)
+
+def print_table(results):
+    header = f"{'threads':>7} {'events':>8} {'E [MeV]':>8} {'events/s':>10} {'±':>8} {'speedup':>7} {'eff.':>6} {'RSS [MB]':>9} {'output':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['threads']:>7} {r['events']:>8} {r['energy_mev']:>8g} {r['events_per_s']:>10.1f} "
+              f"{r['events_per_s_stdev']:>8.1f} {r['speedup']:>7.2f} {r['parallel_efficiency']:>6.0%} "
+              f"{r['peak_rss_mb']:>9.1f} {r['output_bytes'] / 1e6:>8.1f}MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Thread/event scaling benchmark for the Geant4_Project sim application")
+    parser.add_argument("--project", default=os.path.join(SCRIPT_DIR, "Geant4_Project"), help="Path to the sim project")
+    parser.add_argument("--build-dir", help="Where to build sim (default: <project>/build-benchmark)")
+    parser.add_argument("--geant4-prefix", help="Geant4 install prefix; its geant4.sh is sourced for building and running")
+    parser.add_argument("--no-build", action="store_true", help="Use the sim already in the build directory")
+    parser.add_argument("-t", "--threads", default=f"1,2,4,{os.cpu_count() or 1}", help="Comma-separated thread counts")
+    parser.add_argument("-e", "--events", default="10000", help="Comma-separated event counts")
+    parser.add_argument("--energies", default="1", help="Comma-separated primary energies in MeV (default: 1)")
+    parser.add_argument("-r", "--repeats", type=int, default=3, help="Runs per configuration (default: 3)")
+    parser.add_argument("--warmup", type=int, default=100, help="Events in an unmeasured warm-up run (0 to disable)")
+    parser.add_argument("--record-mode", choices=["full", "edep", "summary"], help="Detector recording mode for every run")
+    parser.add_argument("--work-dir", help="Where the runs happen (default: <build-dir>/runs)")
+    parser.add_argument("-o", "--output", default="sim_benchmark.json", help="JSON report (default: sim_benchmark.json)")
+    args = parser.parse_args()
+    project_dir = os.path.abspath(args.project)
+    build_dir = os.path.abspath(args.build_dir or os.path.join(project_dir, "build-benchmark"))
+    prefix = os.path.abspath(os.path.expanduser(args.geant4_prefix)) if args.geant4_prefix else None
+    if args.no_build:
+        sim = os.path.join(build_dir, "sim")
+    else:
+        sim = build_sim(project_dir, build_dir, prefix, os.cpu_count() or 1)
+    work_dir = os.path.abspath(args.work_dir or os.path.join(build_dir, "runs"))
+    grid = [{"threads": threads, "events": events, "energy_mev": energy}
+            for energy in parse_list(args.energies, float)
+            for events in parse_list(args.events)
+            for threads in sorted(set(parse_list(args.threads)))]
+    results = []
+    for number, config in enumerate(grid, 1):
+        label = f"t{config['threads']}-n{config['events']}-e{config['energy_mev']:g}"
+        print(f"[{number}/{len(grid)}] {config['threads']} threads, {config['events']} events, {config['energy_mev']:g} MeV")
+        runs = []
+        for repeat in range(args.repeats):
+            run = run_once(sim, prefix, os.path.join(work_dir, label, f"run{repeat}"), config["threads"],
+                           config["events"], config["energy_mev"], args.warmup, args.record_mode)
+            if run is None:
+                break
+            runs.append(run)
+            print(f"  run {repeat + 1}: {run['events_per_s']:.1f} events/s, {run['peak_rss_mb']:.0f} MB")
+        if runs:
+            results.append(summarize(config, runs))
+    if not results:
+        sys.exit("No configuration finished.")
+    add_efficiency(results)
+    print()
+    print_table(results)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "cpus": os.cpu_count(),
+        "sim": sim,
+        "warmup_events": args.warmup,
+        "record_mode": args.record_mode,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# Merges and histograms the outputs of Geant4_Project `sim` runs without loading them into memory.
+# Point it at output files or folders (a run directory, a whole sim_scan.py scan, ...). The per-thread
+# "Photons" and "Events" ntuples are read in fixed-size chunks into NumPy arrays and binned on the fly,
+# and the "Edep" H1s are summed. ROOT files need uproot (pip install uproot); CSV files written with
+# /PM/run/fileType csv only need NumPy.
+#
+# Results go to <output>/merged.npz plus one CSV per histogram. Running it again on the same output
+# folder only reads files that are new since the last time.
+#
+#   python3 sim_merge.py scans/lead -o scans/lead/merged
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import itertools
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("sim_merge.py needs NumPy: pip install numpy")
+
+NTUPLE_CSV = re.compile(r"_nt_(?P<name>[A-Za-z0-9]+?)(_t\d+)?\.csv$")
+H1_CSV = re.compile(r"_h1_(?P<name>[A-Za-z0-9]+?)(_t\d+)?\.csv$")
+STATE_FILE = "merged.npz"
+
+def parse_range(text, log=False):
+    low, high, bins = text.split(",")
+    if log:
+        return np.logspace(np.log10(float(low)), np.log10(float(high)), int(bins) + 1)
+    return np.linspace(float(low), float(high), int(bins) + 1)
+
+def find_outputs(paths):
+    found = []
+    for path in paths:
+        if os.path.isfile(path):
+            found.append(os.path.abspath(path))
+            continue
+        for root, _, names in os.walk(path):
+            for name in names:
+                if name.endswith(".root") or NTUPLE_CSV.search(name) or H1_CSV.search(name):
+                    found.append(os.path.abspath(os.path.join(root, name)))
+    return sorted(found)
+
+def file_id(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+class Histograms:
+    def __init__(self, edges):
+        self.edges = edges
+        self.counts = {
+            "edep": np.zeros(len(edges["edep"]) - 1),
+            "wlen": np.zeros(len(edges["wlen"]) - 1),
+            "z": np.zeros(len(edges["z"]) - 1),
+            "xy": np.zeros((len(edges["x"]) - 1, len(edges["y"]) - 1)),
+        }
+        self.h1 = None
+        self.h1_edges = None
+        self.rows = {"Photons": 0, "Events": 0}
+
+    def fill_photons(self, columns):
+        self.rows["Photons"] += len(columns["fWlen"])
+        self.counts["wlen"] += np.histogram(columns["fWlen"], self.edges["wlen"])[0]
+        self.counts["z"] += np.histogram(columns["fZ"], self.edges["z"])[0]
+        self.counts["xy"] += np.histogram2d(columns["fX"], columns["fY"], (self.edges["x"], self.edges["y"]))[0]
+
+    def fill_events(self, columns):
+        self.rows["Events"] += len(columns["fEdep"])
+        self.counts["edep"] += np.histogram(columns["fEdep"], self.edges["edep"])[0]
+
+    def add_h1(self, values, edges):
+        if self.h1 is None:
+            self.h1, self.h1_edges = np.zeros(len(values)), np.asarray(edges, dtype=float)
+        elif len(values) != len(self.h1) or not np.allclose(edges, self.h1_edges):
+            print("  skipping an Edep H1 with different binning")
+            return
+        self.h1 += values
+
+    def save(self, output_dir, processed):
+        arrays = {f"{name}_counts": counts for name, counts in self.counts.items()}
+        arrays.update({f"{name}_edges": edges for name, edges in self.edges.items()})
+        if self.h1 is not None:
+            arrays.update(edep_h1_counts=self.h1, edep_h1_edges=self.h1_edges)
+        meta = {"processed": processed, "rows": self.rows, "updated": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        tmp_path = os.path.join(output_dir, STATE_FILE + ".tmp.npz")
+        np.savez(tmp_path, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_path, os.path.join(output_dir, STATE_FILE))
+        for name, edges_name in (("edep", "edep"), ("wlen", "wlen"), ("z", "z")):
+            write_h1_csv(os.path.join(output_dir, f"{name}.csv"), self.edges[edges_name], self.counts[name])
+        if self.h1 is not None:
+            write_h1_csv(os.path.join(output_dir, "edep_h1.csv"), self.h1_edges, self.h1)
+        with open(os.path.join(output_dir, "xy.csv"), "w") as f:
+            f.write("# rows: fX bins " + ",".join(f"{edge:g}" for edge in self.edges["x"]) + "\n")
+            f.write("# columns: fY bins " + ",".join(f"{edge:g}" for edge in self.edges["y"]) + "\n")
+            np.savetxt(f, self.counts["xy"], fmt="%g", delimiter=",")
+
+    @classmethod
+    def load(cls, path, edges):
+        with np.load(path) as state:
+            if any(f"{name}_edges" not in state or not np.array_equal(state[f"{name}_edges"], value)
+                   for name, value in edges.items()):
+                return None, {}
+            histograms = cls(edges)
+            for name in histograms.counts:
+                histograms.counts[name] = state[f"{name}_counts"]
+            if "edep_h1_counts" in state:
+                histograms.h1, histograms.h1_edges = state["edep_h1_counts"], state["edep_h1_edges"]
+            meta = json.loads(str(state["meta"]))
+        histograms.rows = meta["rows"]
+        return histograms, meta["processed"]
+
+def write_h1_csv(path, edges, counts):
+    with open(path, "w") as f:
+        f.write("low,high,count\n")
+        for low, high, count in zip(edges[:-1], edges[1:], counts):
+            f.write(f"{low:g},{high:g},{count:g}\n")
+
+def read_csv_header(f):
+    columns, header = [], []
+    position = f.tell()
+    line = f.readline()
+    while line.startswith("#"):
+        header.append(line)
+        if line.startswith("#column "):
+            columns.append(line.split()[-1])
+        position = f.tell()
+        line = f.readline()
+    f.seek(position)
+    return columns, header
+
+def iterate_csv_ntuple(path, wanted, chunk_size):
+    with open(path, "r") as f:
+        columns, _ = read_csv_header(f)
+        indices = [columns.index(name) for name in wanted]
+        while True:
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                return
+            data = np.loadtxt(lines, delimiter=",", usecols=indices, ndmin=2)
+            yield {name: data[:, i] for i, name in enumerate(wanted)}
+
+def read_csv_h1(path):
+    with open(path, "r") as f:
+        _, header = read_csv_header(f)
+        axis = next((line.split() for line in header if line.startswith("#axis fixed")), None)
+        f.readline()
+        data = np.loadtxt(f, delimiter=",", ndmin=2)
+    if axis is None:
+        return None, None
+    bins, low, high = int(axis[2]), float(axis[3]), float(axis[4])
+    # Rows are underflow, the bins, then overflow; the second column is the sum of weights.
+    return data[1:-1, 1], np.linspace(low, high, bins + 1)
+
+def iterate_root_ntuple(tree, wanted, chunk_size):
+    for chunk in tree.iterate(wanted, step_size=chunk_size, library="np"):
+        yield chunk
+
+def process_file(path, histograms, chunk_size):
+    name = os.path.basename(path)
+    if name.endswith(".root"):
+        try:
+            import uproot
+        except ImportError:
+            sys.exit(f"Reading {name} needs uproot (pip install uproot), or rerun sim with /PM/run/fileType csv")
+        with uproot.open(path) as f:
+            keys = set(f.keys(cycle=False))
+            if "Photons" in keys:
+                for chunk in iterate_root_ntuple(f["Photons"], ["fX", "fY", "fZ", "fWlen"], chunk_size):
+                    histograms.fill_photons(chunk)
+            if "Events" in keys:
+                for chunk in iterate_root_ntuple(f["Events"], ["fEdep"], chunk_size):
+                    histograms.fill_events(chunk)
+            if "Edep" in keys:
+                h1 = f["Edep"]
+                histograms.add_h1(h1.values(), h1.axis().edges())
+        return
+    ntuple = NTUPLE_CSV.search(name)
+    if ntuple and ntuple.group("name") == "Photons":
+        for chunk in iterate_csv_ntuple(path, ["fX", "fY", "fZ", "fWlen"], chunk_size):
+            histograms.fill_photons(chunk)
+    elif ntuple and ntuple.group("name") == "Events":
+        for chunk in iterate_csv_ntuple(path, ["fEdep"], chunk_size):
+            histograms.fill_events(chunk)
+    elif H1_CSV.search(name) and H1_CSV.search(name).group("name") == "Edep":
+        values, edges = read_csv_h1(path)
+        if values is not None:
+            histograms.add_h1(values, edges)
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked merge and histogramming of sim output files")
+    parser.add_argument("paths", nargs="+", help="Output files or directories to search for them")
+    parser.add_argument("-o", "--output", default="merged", help="Output directory (default: merged)")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Rows read at a time (default: 1000000)")
+    parser.add_argument("--edep-bins", default="0,1.1,100", help="Edep histogram low,high,bins in MeV (default: 0,1.1,100)")
+    parser.add_argument("--wlen-bins", default="1e-5,1e2,140", help="fWlen histogram low,high,bins in nm, log-spaced (default: 1e-5,1e2,140)")
+    parser.add_argument("--xy-bins", default="-50,50,100", help="fX and fY histogram low,high,bins in mm (default: -50,50,100)")
+    parser.add_argument("--z-bins", default="50,160,110", help="fZ histogram low,high,bins in mm (default: 50,160,110)")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the previous merge and read every file again")
+    args = parser.parse_args()
+    edges = {
+        "edep": parse_range(args.edep_bins),
+        "wlen": parse_range(args.wlen_bins, log=True),
+        "x": parse_range(args.xy_bins),
+        "y": parse_range(args.xy_bins),
+        "z": parse_range(args.z_bins),
+    }
+    os.makedirs(args.output, exist_ok=True)
+    output_dir = os.path.abspath(args.output)
+    files = [path for path in find_outputs(args.paths) if not path.startswith(output_dir + os.sep)]
+    histograms, processed = None, {}
+    state_path = os.path.join(output_dir, STATE_FILE)
+    if os.path.exists(state_path) and not args.rebuild:
+        histograms, processed = Histograms.load(state_path, edges)
+        if histograms is None:
+            print("Binning changed since the last merge, starting over.")
+        elif any(path in processed and processed[path] != file_id(path) for path in files):
+            print("Some already merged files have changed, starting over.")
+            histograms, processed = None, {}
+    if histograms is None:
+        histograms, processed = Histograms(edges), {}
+    todo = [path for path in files if path not in processed]
+    print(f"{len(files)} output files, {len(files) - len(todo)} already merged, reading {len(todo)}")
+    started = time.perf_counter()
+    total_bytes = 0
+    for number, path in enumerate(todo, 1):
+        process_file(path, histograms, args.chunk_size)
+        processed[path] = file_id(path)
+        total_bytes += processed[path][0]
+        print(f"[{number}/{len(todo)}] {os.path.relpath(path)}")
+    elapsed = time.perf_counter() - started
+    histograms.save(output_dir, processed)
+    rate = total_bytes / elapsed / 1e6 if elapsed > 0 else 0
+    print(f"Read {total_bytes / 1e6:.1f} MB in {elapsed:.1f}s ({rate:.0f} MB/s). "
+          f"Totals: {histograms.rows['Photons']} Photons rows, {histograms.rows['Events']} Events rows.")
+    print(f"Histograms written to {output_dir}")
+
+if __name__ == "__main__":
+    main()
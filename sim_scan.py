@@ -0,0 +1,177 @@
+# Runs a parameter scan of the Geant4_Project `sim` application on all cores of a node.
+# Every combination of the --param values gets its own directory with a generated macro, its log and
+# its output files. Jobs are started as soon as enough cores are free for their /run/numberOfThreads,
+# and finished jobs are marked, so running the same command again picks an interrupted scan back up.
+#
+#   python3 sim_scan.py --geant4-prefix Geant4/geant4-v11.3.1-install --name lead \
+#       --param thickness=1,2,4,8 --param energy=0.5,1,2 --param particle=gamma,e- --events 100000
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import itertools
+import subprocess
+
+from geant4_install import get_usable_cpus
+from sim_benchmark import SCRIPT_DIR, build_sim, geant4_command
+
+# Scan parameter -> (macro command, whether it has to come before /run/initialize)
+PARAMETERS = {
+    "threads": ("/run/numberOfThreads {}", True),
+    "thickness": ("/PM/detector/leadThickness {} mm", True),
+    "recordMode": ("/PM/detector/recordMode {}", True),
+    "particle": ("/gun/particle {}", False),
+    "energy": ("/gun/energy {} MeV", False),
+}
+DONE_FILE = "done.json"
+
+def parse_params(specs):
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in PARAMETERS or not values:
+            sys.exit(f"Bad --param '{spec}'. Use name=v1,v2,... with name one of: {', '.join(PARAMETERS)}")
+        grid[name] = [value for value in values.split(",") if value]
+    return grid
+
+def expand_jobs(grid, threads, events, scan_dir):
+    names = sorted(grid)
+    jobs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        params.setdefault("threads", str(threads))
+        label = "_".join(f"{name}={re.sub(r'[^A-Za-z0-9.+-]', '', params[name])}" for name in names) or "default"
+        before = [PARAMETERS[name][0].format(params[name]) for name in PARAMETERS if name in params and PARAMETERS[name][1]]
+        after = [PARAMETERS[name][0].format(params[name]) for name in PARAMETERS if name in params and not PARAMETERS[name][1]]
+        macro = "\n".join(["/control/verbose 0", "/run/verbose 0"] + before + ["/run/initialize"]
+                          + after + [f"/run/beamOn {events}"]) + "\n"
+        jobs.append({
+            "label": label,
+            "params": params,
+            "threads": int(params["threads"]),
+            "dir": os.path.join(scan_dir, label),
+            "macro": macro,
+            "macro_sha256": hashlib.sha256(macro.encode()).hexdigest(),
+        })
+    return jobs
+
+def is_done(job):
+    try:
+        with open(os.path.join(job["dir"], DONE_FILE), "r") as f:
+            return json.load(f).get("macro_sha256") == job["macro_sha256"]
+    except (OSError, ValueError):
+        return False
+
+def start_job(job, sim, prefix):
+    if os.path.exists(job["dir"]):
+        shutil.rmtree(job["dir"])
+    os.makedirs(job["dir"])
+    with open(os.path.join(job["dir"], "run.mac"), "w") as f:
+        f.write(job["macro"])
+    with open(os.path.join(job["dir"], "sim.log"), "w") as log:
+        process = subprocess.Popen(geant4_command(f'exec "{sim}" run.mac', prefix), cwd=job["dir"],
+                                   stdout=log, stderr=subprocess.STDOUT)
+    job["started"] = time.perf_counter()
+    return process
+
+def finish_job(job, status, usage):
+    result = {
+        "label": job["label"],
+        "params": job["params"],
+        "returncode": os.waitstatus_to_exitcode(status),
+        "wall_s": round(time.perf_counter() - job["started"], 2),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "outputs": sorted(name for name in os.listdir(job["dir"]) if name.startswith("output")),
+        "macro_sha256": job["macro_sha256"],
+    }
+    if result["returncode"] == 0:
+        with open(os.path.join(job["dir"], DONE_FILE), "w") as f:
+            json.dump(result, f, indent=2)
+    return result
+
+def next_job(pending, free_cores, running):
+    # Biggest job that fits into the free cores; a job wider than the node runs on its own.
+    for job in pending:
+        if job["threads"] <= free_cores or not running:
+            return job
+    return None
+
+def run_scan(jobs, sim, prefix, cores):
+    pending = sorted(jobs, key=lambda job: -job["threads"])
+    running = {}
+    results = []
+    free_cores = cores
+    try:
+        while pending or running:
+            job = next_job(pending, free_cores, running)
+            while job:
+                pending.remove(job)
+                process = start_job(job, sim, prefix)
+                # Keep the Popen object alive: subprocess reaps the children of collected Popen objects itself.
+                running[process.pid] = (job, process)
+                free_cores -= job["threads"]
+                job = next_job(pending, free_cores, running)
+            pid, status, usage = os.wait4(-1, 0)
+            if pid not in running:
+                continue
+            job, _ = running.pop(pid)
+            free_cores += job["threads"]
+            result = finish_job(job, status, usage)
+            results.append(result)
+            state = "done" if result["returncode"] == 0 else f"FAILED ({result['returncode']}), see {job['dir']}/sim.log"
+            print(f"[{len(results)}/{len(jobs)}] {job['label']}: {state} in {result['wall_s']:.1f}s")
+    except KeyboardInterrupt:
+        for _, process in running.values():
+            process.terminate()
+        print("\nInterrupted. Run the same command again to resume the scan.")
+        raise SystemExit(130)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter scan for the Geant4_Project sim application")
+    parser.add_argument("-p", "--param", action="append", default=[],
+                        help=f"Scan parameter as name=v1,v2,... (repeatable). Names: {', '.join(PARAMETERS)}")
+    parser.add_argument("-n", "--events", type=int, default=10000, help="Events per job (default: 10000)")
+    parser.add_argument("-t", "--threads", type=int, default=1, help="/run/numberOfThreads per job unless scanned (default: 1)")
+    parser.add_argument("-c", "--cores", type=int, default=get_usable_cpus(), help="Cores to fill (default: all usable)")
+    parser.add_argument("--name", default="scan", help="Scan name; results go to <scan-dir>/<name> (default: scan)")
+    parser.add_argument("--scan-dir", default="scans", help="Parent directory of all scans (default: scans)")
+    parser.add_argument("--project", default=os.path.join(SCRIPT_DIR, "Geant4_Project"), help="Path to the sim project")
+    parser.add_argument("--build-dir", help="Where to build sim (default: <project>/build-scan)")
+    parser.add_argument("--geant4-prefix", help="Geant4 install prefix; its geant4.sh is sourced for building and running")
+    parser.add_argument("--no-build", action="store_true", help="Use the sim already in the build directory")
+    parser.add_argument("--restart", action="store_true", help="Rerun every job, even the finished ones")
+    args = parser.parse_args()
+    project_dir = os.path.abspath(args.project)
+    build_dir = os.path.abspath(args.build_dir or os.path.join(project_dir, "build-scan"))
+    prefix = os.path.abspath(os.path.expanduser(args.geant4_prefix)) if args.geant4_prefix else None
+    if args.no_build:
+        sim = os.path.join(build_dir, "sim")
+    else:
+        sim = build_sim(project_dir, build_dir, prefix, args.cores)
+    scan_dir = os.path.abspath(os.path.join(args.scan_dir, args.name))
+    jobs = expand_jobs(parse_params(args.param), args.threads, args.events, scan_dir)
+    todo = [job for job in jobs if args.restart or not is_done(job)]
+    print(f"{len(jobs)} jobs in {scan_dir}, {len(jobs) - len(todo)} already done, running {len(todo)} on {args.cores} cores")
+    os.makedirs(scan_dir, exist_ok=True)
+    results = run_scan(todo, sim, prefix, args.cores)
+    index = []
+    for job in jobs:
+        try:
+            with open(os.path.join(job["dir"], DONE_FILE), "r") as f:
+                index.append(dict(json.load(f), status="done"))
+        except (OSError, ValueError):
+            index.append({"label": job["label"], "params": job["params"], "status": "failed"})
+    with open(os.path.join(scan_dir, "scan.json"), "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "events": args.events, "jobs": index}, f, indent=2)
+    failed = sum(1 for result in results if result["returncode"] != 0)
+    print(f"Scan index written to {os.path.join(scan_dir, 'scan.json')}" + (f" ({failed} failed)" if failed else ""))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
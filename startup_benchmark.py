@@ -0,0 +1,81 @@
+# Measures how long geant4_install.py takes to reach its first question (the version menu).
+# Run it before and after touching the startup path and compare, or keep appending to the
+# history file to watch for slow creep.
+
+import os
+import sys
+import json
+import time
+import select
+import argparse
+import statistics
+import subprocess
+import tempfile
+import contextlib
+
+FIRST_PROMPT = "Choose a version to install"
+
+def time_to_first_prompt(installer, extra_args, timeout):
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, installer] + extra_args,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT
+    )
+    output = b""
+    try:
+        while time.perf_counter() - started < timeout:
+            ready, _, _ = select.select([process.stdout], [], [], 0.1)
+            if ready:
+                chunk = os.read(process.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                output += chunk
+                if FIRST_PROMPT.encode() in output:
+                    return time.perf_counter() - started
+            elif process.poll() is not None:
+                break
+    finally:
+        process.kill()
+        process.wait()
+    print(output.decode(errors="replace")[-2000:])
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-prompt benchmark for geant4_install.py")
+    parser.add_argument("-r", "--runs", type=int, default=10, help="Number of runs (default: 10)")
+    parser.add_argument("--cold", action="store_true", help="Use a fresh cache directory for every run (needs network)")
+    parser.add_argument("--timeout", type=float, default=60, help="Give up on a run after this many seconds")
+    parser.add_argument("--history", help="Append the result as one JSON line to this file")
+    parser.add_argument("installer_args", nargs="*", help="Extra arguments passed to geant4_install.py")
+    args = parser.parse_args()
+    installer = os.path.join(os.path.dirname(os.path.abspath(__file__)), "geant4_install.py")
+    timings = []
+    for run in range(args.runs):
+        extra_args = list(args.installer_args)
+        cache = tempfile.TemporaryDirectory(prefix="geant4-startup-") if args.cold else contextlib.nullcontext()
+        with cache as cache_dir:
+            if cache_dir:
+                extra_args += ["--cache-dir", cache_dir]
+            elapsed = time_to_first_prompt(installer, extra_args, args.timeout)
+        if elapsed is None:
+            sys.exit(f"Run {run + 1} never reached the first prompt.")
+        timings.append(elapsed)
+        print(f"  run {run + 1}: {elapsed * 1000:.0f} ms")
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mode": "cold" if args.cold else "warm",
+        "runs": len(timings),
+        "min_ms": round(min(timings) * 1000, 1),
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "max_ms": round(max(timings) * 1000, 1),
+    }
+    print(f"Time to first prompt ({result['mode']}): min {result['min_ms']} ms, "
+          f"median {result['median_ms']} ms, max {result['max_ms']} ms")
+    if args.history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+if __name__ == "__main__":
+    main()
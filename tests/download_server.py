@@ -0,0 +1,78 @@
+# Local HTTP server for the downloader tests. It serves one payload, optionally honours Range requests,
+# can be throttled, and can cut the connection part-way through the first few ranged responses.
+
+import re
+import time
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+class PayloadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        payload = server.payload
+        match = RANGE.match(self.headers.get("Range", "")) if server.ranges else None
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else len(payload) - 1, len(payload) - 1)
+            body = payload[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+        else:
+            start, body = 0, payload
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes" if server.ranges else "none")
+        self.end_headers()
+        with server.lock:
+            server.requests.append(self.headers.get("Range"))
+            drop = bool(match) and len(body) > 1 and server.drops > 0
+            if drop:
+                server.drops -= 1
+        if drop:
+            body = body[:len(body) // 2]
+        for offset in range(0, len(body), server.block_size):
+            block = body[offset:offset + server.block_size]
+            try:
+                self.wfile.write(block)
+                self.wfile.flush()
+            except OSError:
+                return
+            if server.delay:
+                time.sleep(server.delay)
+        if drop:
+            # Close mid-body, so the client sees fewer bytes than Content-Length promised.
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+
+class PayloadServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, payload, ranges=True, delay=0.0, block_size=16 * 1024, drops=0):
+        super().__init__(("127.0.0.1", 0), PayloadHandler)
+        self.payload = payload
+        self.ranges = ranges
+        self.delay = delay
+        self.block_size = block_size
+        self.drops = drops
+        self.lock = threading.Lock()
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/payload.tar.gz"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
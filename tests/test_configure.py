@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geant4_install
+
+def configure(monkeypatch, build_dir, generator):
+    commands = []
+    monkeypatch.chdir(build_dir)
+    monkeypatch.setattr(geant4_install, "get_cmake_generator", lambda: generator)
+    monkeypatch.setattr(geant4_install, "run_command", lambda command, *a, **k: commands.append(command) or 0)
+    assert geant4_install.configure_geant4("../src", {"GEANT4_USE_QT": "ON"}, "default") == 0
+    return commands
+
+def write_cache(build_dir, generator):
+    (build_dir / "CMakeFiles").mkdir()
+    (build_dir / "CMakeCache.txt").write_text(f"CMAKE_GENERATOR:INTERNAL={generator}\nGEANT4_USE_QT:BOOL=ON\n")
+
+def test_generator_change_drops_cmake_cache(monkeypatch, tmp_path):
+    write_cache(tmp_path, "Unix Makefiles")
+    commands = configure(monkeypatch, tmp_path, "Ninja")
+    assert not (tmp_path / "CMakeCache.txt").exists()
+    assert not (tmp_path / "CMakeFiles").exists()
+    assert commands[0].startswith('cmake -G "Ninja"')
+
+def test_same_generator_keeps_cmake_cache(monkeypatch, tmp_path):
+    write_cache(tmp_path, "Ninja")
+    configure(monkeypatch, tmp_path, "Ninja")
+    assert (tmp_path / "CMakeCache.txt").exists()
+    assert (tmp_path / "CMakeFiles").exists()
+
+def test_configure_outputs_track_job_pools(tmp_path):
+    (tmp_path / "build.ninja").write_text("")
+    (tmp_path / "CMakeCache.txt").write_text("CMAKE_JOB_POOLS:STRING=compile=8;link=2\n")
+    before = geant4_install.configure_outputs(str(tmp_path))
+    (tmp_path / "CMakeCache.txt").write_text("CMAKE_JOB_POOLS:STRING=compile=4;link=2\n")
+    assert geant4_install.configure_outputs(str(tmp_path)) != before
+
+def test_build_retry_shrinks_job_pools(monkeypatch):
+    statuses = [1, 0]
+    monkeypatch.setattr(geant4_install, "memory_watchdog", lambda state: state.update(oom_risk=True))
+    monkeypatch.setattr(geant4_install, "run_command", lambda *a, **k: statuses.pop(0))
+    retries = []
+    assert geant4_install.run_build("ninja -j{jobs}", 8, "Compiling", on_retry=retries.append) == 0
+    assert retries == [4]
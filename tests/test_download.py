@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import geant4_install
+from download_server import PayloadServer
+
+CHUNK = 64 * 1024
+
+def make_payload(size):
+    return os.urandom(size)
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def journal_done(journal_path):
+    try:
+        with open(journal_path, "r") as f:
+            chunks = json.load(f)["chunks"]
+    except (OSError, ValueError, KeyError):
+        return 0
+    return sum(1 for chunk in chunks if chunk["start"] + chunk["done"] > chunk["end"])
+
+def test_dropped_connection_retries_chunk(tmp_path):
+    payload = make_payload(4 * CHUNK)
+    dest = str(tmp_path / "payload.tar.gz")
+    with PayloadServer(payload, drops=2) as server:
+        assert geant4_install.download_file(server.url, dest, hashlib.sha256(payload).hexdigest(),
+                                            connections=2, chunk_size=CHUNK, quiet=True)
+        ranged = [r for r in server.requests if r != "bytes=0-0"]
+    assert read(dest) == payload
+    # Four chunks plus the two that were cut off and fetched again from where they stopped.
+    assert len(ranged) == 6
+    assert not os.path.exists(dest + ".part")
+    assert not os.path.exists(dest + ".journal")
+
+def test_resume_from_journal_in_new_process(tmp_path):
+    payload = make_payload(16 * CHUNK)
+    dest = str(tmp_path / "payload.tar.gz")
+    with PayloadServer(payload, delay=0.05) as server:
+        code = (f"import sys; sys.path.insert(0, {REPO_DIR!r}); import geant4_install; "
+                f"geant4_install.download_file({server.url!r}, {dest!r}, connections=1, chunk_size={CHUNK}, quiet=True)")
+        child = subprocess.Popen([sys.executable, "-c", code])
+        deadline = time.monotonic() + 30
+        while journal_done(dest + ".journal") < 3 and time.monotonic() < deadline and child.poll() is None:
+            time.sleep(0.05)
+        child.kill()
+        child.wait()
+        assert journal_done(dest + ".journal") >= 3
+        assert not os.path.exists(dest)
+        server.delay = 0
+        server.requests.clear()
+        assert geant4_install.download_file(server.url, dest, hashlib.sha256(payload).hexdigest(),
+                                            connections=2, chunk_size=CHUNK, quiet=True)
+        ranges = [[int(value) for value in r[6:].split("-")] for r in server.requests if r != "bytes=0-0"]
+        assert min(start for start, _ in ranges) >= 3 * CHUNK
+        assert sum(end + 1 - start for start, end in ranges) <= len(payload) - 3 * CHUNK
+    assert read(dest) == payload
+    assert not os.path.exists(dest + ".journal")
+
+def test_server_without_range_support(tmp_path):
+    payload = make_payload(3 * CHUNK + 123)
+    dest = str(tmp_path / "payload.tar.gz")
+    with PayloadServer(payload, ranges=False) as server:
+        assert geant4_install.download_file(server.url, dest, hashlib.sha256(payload).hexdigest(),
+                                            chunk_size=CHUNK, quiet=True)
+        assert len(server.requests) == 2
+    assert read(dest) == payload
+    assert not os.path.exists(dest + ".journal")
+    assert read(dest + ".sha256").split()[0].decode() == hashlib.sha256(payload).hexdigest()
+
+def test_checksum_mismatch_removes_partial_files(tmp_path):
+    payload = make_payload(2 * CHUNK)
+    dest = str(tmp_path / "payload.tar.gz")
+    with PayloadServer(payload) as server:
+        assert not geant4_install.download_file(server.url, dest, "0" * 64, chunk_size=CHUNK, quiet=True)
+    for path in (dest, dest + ".part", dest + ".journal", dest + ".sha256"):
+        assert not os.path.exists(path)
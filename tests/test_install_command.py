@@ -0,0 +1,31 @@
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geant4_install
+
+def install_command(monkeypatch, family, package_cache=None, offline=False, distro="Ubuntu 24.04"):
+    monkeypatch.setattr(geant4_install, "args", argparse.Namespace(package_cache=package_cache, offline=offline))
+    return geant4_install.get_install_command(family, distro, ["cmake", "g++"])
+
+def test_apt_keeps_downloaded_packages_in_cache(monkeypatch, tmp_path):
+    cache = str(tmp_path / "debs")
+    command = install_command(monkeypatch, "debian", package_cache=cache)
+    install = command.split("&&")[-1]
+    assert f"-o Dir::Cache::archives={cache}" in install
+    assert "-o APT::Keep-Downloaded-Packages=true" in install
+    assert install.strip().endswith("cmake g++")
+
+def test_apt_offline_installs_from_cache(monkeypatch, tmp_path):
+    cache = str(tmp_path / "debs")
+    command = install_command(monkeypatch, "debian", package_cache=cache, offline=True)
+    assert "apt update" not in command
+    assert "--no-download" in command
+    assert f"-o Dir::Cache::archives={cache}" in command
+    assert "-o APT::Keep-Downloaded-Packages=true" in command
+
+def test_apt_without_cache(monkeypatch):
+    command = install_command(monkeypatch, "debian")
+    assert command == "sudo apt update && sudo apt install -y cmake g++"